@@ -0,0 +1,389 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import time
+import zipfile
+from typing import Any, BinaryIO, Callable, Optional
+
+import h5py
+import numpy as np
+import pandas as pd
+
+from nomad_uibk_plugin.filereader.IFMmodels import DEFECT_TYPES
+
+# version of the extracted model metadata, increment it to invalidate cached metadata
+KERAS_READER_VERSION = 1
+
+# version of the data read from prediction csv files, increment it to invalidate the
+# cached predictions
+PREDICTION_READER_VERSION = 1
+
+# classes of the predicted tiles in the order of the columns of the prediction csv
+DEFECT_CLASSES = (*DEFECT_TYPES, 'No Error')
+
+
+def read_keras_summary(file_obj: BinaryIO) -> tuple[int, int]:
+    """
+    Returns the number of layers and parameters of a `.keras` zip archive or a legacy
+    `.h5` Keras model file. They are read from the model config and the shapes of the
+    stored weights without loading the model.
+    """
+    if zipfile.is_zipfile(file_obj):
+        file_obj.seek(0)
+        with zipfile.ZipFile(file_obj) as archive:
+            config = json.loads(archive.read('config.json'))
+            with (
+                archive.open('model.weights.h5') as weights_file,
+                h5py.File(weights_file, 'r') as weights,
+            ):
+                # layer weights are stored in `layers` (Keras 3) or
+                # `_layer_checkpoint_dependencies` (tf.keras 2), the optimizer and
+                # metric variables next to them are not part of the model
+                number_of_parameters = sum(
+                    count_h5_parameters(weights[group])
+                    for group in ('layers', '_layer_checkpoint_dependencies', 'vars')
+                    if group in weights
+                )
+    else:
+        file_obj.seek(0)
+        with h5py.File(file_obj, 'r') as model_file:
+            config = json.loads(model_file.attrs['model_config'])
+            number_of_parameters = count_h5_parameters(model_file['model_weights'])
+
+    return count_keras_layers(config), number_of_parameters
+
+
+def count_keras_layers(config: dict) -> int:
+    """
+    Returns the number of layers of a Keras model config as given by `model.layers`.
+    """
+    layers = config['config']['layers']
+    # the input layer is not part of the layers of a sequential model
+    if config['class_name'] == 'Sequential':
+        layers = [layer for layer in layers if layer['class_name'] != 'InputLayer']
+    return len(layers)
+
+
+def count_h5_parameters(group: h5py.Group) -> int:
+    """
+    Returns the total size of all datasets in an HDF5 group without reading them.
+    """
+    sizes = []
+
+    def add_size(_, item):
+        if isinstance(item, h5py.Dataset):
+            sizes.append(item.size)
+
+    group.visititems(add_size)
+    return sum(sizes)
+
+
+def read_prediction_csv(
+    csv_path: str, cache: Optional['PredictionCache'] = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reads the predicted defects of the tiles of an image from a csv file written by
+    the defect recognition. Only the positions and the scores are parsed with
+    explicit types, the class of a tile is the one with the highest score.
+
+    If a `cache` is given, the result is read from a binary copy unless the csv file
+    changed.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The x and y positions of the tiles
+        and the indices of their classes in `DEFECT_CLASSES` as `uint8`.
+    """
+    if cache is not None:
+        predictions = cache.get(csv_path)
+        if predictions is not None:
+            return predictions
+
+    data = pd.read_csv(
+        csv_path,
+        skiprows=2,
+        usecols=['x', 'y', *DEFECT_CLASSES],
+        dtype={'x': np.int32, 'y': np.int32, **dict.fromkeys(DEFECT_CLASSES, 'f4')},
+        engine='c',
+    )
+    scores = data[list(DEFECT_CLASSES)].to_numpy()
+    # missing scores are never the maximum
+    labels = np.argmax(np.nan_to_num(scores, nan=-np.inf), axis=1).astype(np.uint8)
+    predictions = data['x'].to_numpy(), data['y'].to_numpy(), labels
+
+    if cache is not None:
+        cache.put(csv_path, predictions)
+    return predictions
+
+
+def claim_path(path: str) -> str:
+    """
+    Returns the path of the file claiming the output file at the path.
+    """
+    return f'{path}.claim'
+
+
+def is_claimed(path: str, timeout: float) -> bool:
+    """
+    Returns whether the output file at the path is claimed by a worker. Claims older
+    than `timeout` seconds are stale, they are left by workers that stopped before
+    releasing them.
+    """
+    try:
+        claimed_at = os.stat(claim_path(path)).st_mtime
+    except FileNotFoundError:
+        return False
+    return time.time() - claimed_at < timeout
+
+
+def is_interrupted(path: str, timeout: float) -> bool:
+    """
+    Returns whether the output file at the path has a stale claim. The worker of the
+    claim stopped before releasing it, so the file may be partially written.
+    """
+    return os.path.exists(claim_path(path)) and not is_claimed(path, timeout)
+
+
+def claim_files(paths: list[str], timeout: float) -> bool:
+    """
+    Claims the output files at the paths for the calling process by creating a claim
+    file next to each of them. The claim files are created exclusively, so only one
+    process of all workers sharing the files gets the claim. Either all files are
+    claimed or none. Stale claims are taken over and their possibly partial output
+    files are removed.
+
+    Returns:
+        bool: Whether the files are claimed.
+    """
+    claimed = []
+    for path in paths:
+        if is_claimed(path, timeout):
+            release_files(claimed)
+            return False
+        if os.path.exists(claim_path(path)):
+            # the output of a stale claim is removed before the claim, so no worker
+            # reads it in between
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            release_files([path])
+        try:
+            fd = os.open(claim_path(path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            release_files(claimed)
+            return False
+        with os.fdopen(fd, 'w') as file:
+            file.write(f'{socket.gethostname()}:{os.getpid()}\n')
+        claimed.append(path)
+    return True
+
+
+def release_files(paths: list[str]) -> None:
+    """
+    Releases the claims of the output files at the paths.
+    """
+    for path in paths:
+        try:
+            os.remove(claim_path(path))
+        except FileNotFoundError:
+            pass
+
+
+class DirectoryCache:
+    """
+    Persistent on-disk cache with one file per entry.
+
+    The entries are named by their key and the `version` of the cached data, so they
+    are shared by all processes using the same directory and survive restarts. They
+    are written to a temporary file first, so no process reads a partial entry. The
+    least recently used entries are deleted once the total size of the entries
+    exceeds `max_size` bytes.
+
+    Args:
+        directory (str): The directory of the cache, created if it does not exist.
+        max_size (int): The maximum total size of the cached entries in bytes.
+    """
+
+    suffix = '.json'
+    version = 1
+
+    def __init__(self, directory: str, max_size: int = 2**20):
+        self.directory = directory
+        self.max_size = max_size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.v{self.version}{self.suffix}')
+
+    def _entries(self) -> list[os.DirEntry]:
+        try:
+            with os.scandir(self.directory) as entries:
+                return [entry for entry in entries if entry.name.endswith(self.suffix)]
+        except FileNotFoundError:
+            return []
+
+    def __len__(self) -> int:
+        return len(self._entries())
+
+    def _read(self, key: str, read: Callable[[str], Any]) -> Any:
+        """
+        Returns the entry with the key read by `read` from its path or None if it is
+        not cached.
+        """
+        path = self._path(key)
+        try:
+            entry = read(path)
+            # mark the entry as recently used
+            os.utime(path)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+        return entry
+
+    def _write(self, key: str, write: Callable[[BinaryIO], None]) -> None:
+        """
+        Writes the entry with the key by `write` to a file and evicts the least
+        recently used entries exceeding the size limit.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            file = tempfile.NamedTemporaryFile(
+                'wb', dir=self.directory, suffix='.tmp', delete=False
+            )
+        except OSError:
+            return
+        try:
+            with file:
+                write(file)
+            os.replace(file.name, self._path(key))
+        except BaseException as e:
+            # the temporary file is removed if the entry is not written
+            try:
+                os.remove(file.name)
+            except FileNotFoundError:
+                pass
+            if isinstance(e, OSError):
+                return
+            raise
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Deletes the least recently used entries until the size limit is met.
+        """
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+
+class KerasMetadataCache(DirectoryCache):
+    """
+    Persistent on-disk cache for the number of layers and parameters of Keras models.
+
+    Every entry is a small JSON file keyed by the SHA-256 digest of the model file.
+    """
+
+    suffix = '.json'
+    version = KERAS_READER_VERSION
+
+    def get(self, digest: str) -> Optional[tuple[int, int]]:
+        """
+        Returns the cached number of layers and parameters of the model file with the
+        given digest or None if it is not cached.
+        """
+
+        def read(path: str) -> tuple[int, int]:
+            with open(path) as file:
+                entry = json.load(file)
+            return entry['number_of_layers'], entry['number_of_parameters']
+
+        return self._read(digest, read)
+
+    def put(self, digest: str, summary: tuple[int, int]) -> None:
+        """
+        Caches the number of layers and parameters of the model file with the given
+        digest.
+        """
+        number_of_layers, number_of_parameters = summary
+        entry = dict(
+            number_of_layers=number_of_layers,
+            number_of_parameters=number_of_parameters,
+        )
+        self._write(digest, lambda file: file.write(json.dumps(entry).encode()))
+
+
+class PredictionCache(DirectoryCache):
+    """
+    Persistent on-disk cache for the predictions read from prediction csv files.
+
+    Every entry is an uncompressed `.npz` file keyed by the path, the modification
+    time and the size of the csv file, so it is not used once the file changes.
+    """
+
+    suffix = '.npz'
+    version = PREDICTION_READER_VERSION
+
+    @staticmethod
+    def _key(csv_path: str) -> str:
+        path = os.path.realpath(csv_path)
+        stat = os.stat(path)
+        return hashlib.sha256(
+            f'{path}:{stat.st_mtime_ns}:{stat.st_size}'.encode()
+        ).hexdigest()
+
+    def get(self, csv_path: str) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Returns the cached predictions of the csv file or None if they are not
+        cached.
+        """
+
+        def read(path: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+            with np.load(path) as entry:
+                return entry['x'], entry['y'], entry['labels']
+
+        try:
+            return self._read(self._key(csv_path), read)
+        except OSError:
+            return None
+
+    def put(
+        self, csv_path: str, predictions: tuple[np.ndarray, np.ndarray, np.ndarray]
+    ) -> None:
+        """
+        Caches the predictions of the csv file.
+        """
+        x, y, labels = predictions
+        self._write(
+            self._key(csv_path), lambda file: np.savez(file, x=x, y=y, labels=labels)
+        )
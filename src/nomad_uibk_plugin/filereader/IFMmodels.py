@@ -0,0 +1,83 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+# classes of the classification model, tiles without defect are labeled `No Error`
+DEFECT_TYPES = ('Whiskers', 'Chipping', 'Scratch')
+
+
+class BackgroundJobs:
+    """
+    Runs long jobs, like analyses, in a thread pool of the worker and keeps track of
+    them by key until their result is picked up.
+
+    TensorFlow releases the GIL during inference and the daemonic processes of the
+    worker cannot start child processes, so threads are used instead of processes.
+    The thread pool is only started with the first job. The jobs are only known to
+    the worker, so the outputs of a job are claimed with `IFMfiles.claim_files` for
+    all workers.
+
+    Args:
+        max_workers (int): The maximum number of jobs running at the same time.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def submit(self, key: str, function: Callable, *args, **kwargs) -> str:
+        """
+        Submits a job unless a job with the same key is pending and returns the
+        status of the job with the key.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.done():
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        self.max_workers, thread_name_prefix='background-job'
+                    )
+                self._jobs[key] = self._executor.submit(function, *args, **kwargs)
+        return self.status(key)
+
+    def status(self, key: str) -> Optional[str]:
+        """
+        Returns the status of the job with the key: `queued`, `running`, `finished`
+        or `failed`, or None if there is no such job.
+        """
+        job = self._jobs.get(key)
+        if job is None:
+            return None
+        if not job.done():
+            return 'running' if job.running() else 'queued'
+        return 'failed' if job.exception() is not None else 'finished'
+
+    def pop(self, key: str) -> Optional[Future]:
+        """
+        Removes the job with the key and returns it.
+        """
+        with self._lock:
+            return self._jobs.pop(key, None)
@@ -19,17 +19,20 @@
 import locale
 import re
 import xml.etree.ElementTree as ET
+import zipfile
 from datetime import datetime
-from typing import TYPE_CHECKING, TextIO
-
-import tensorflow as tf
+from typing import TYPE_CHECKING, BinaryIO, Optional, TextIO
 
+from nomad_uibk_plugin.filereader.IFMfiles import read_keras_summary
 from nomad_uibk_plugin.schema_packages.IFMschema import IFMMeasurement, IFMModel, ureg
+from nomad_uibk_plugin.utils import file_digest
 
 if TYPE_CHECKING:
     from nomad.datamodel.datamodel import EntryArchive
     from structlog.stdlib import BoundLogger
 
+    from nomad_uibk_plugin.filereader.IFMfiles import KerasMetadataCache
+
 # set locale for parsing dates
 locale.setlocale(locale.LC_TIME, 'de_DE.UTF-8')
 
@@ -94,10 +97,16 @@ def parse_description_field(description: str) -> dict:
 
 
 def read_keras_metadata(
-    file_obj: TextIO, archive: 'EntryArchive', logger: 'BoundLogger'
+    file_obj: TextIO,
+    archive: 'EntryArchive',
+    logger: 'BoundLogger',
+    cache: Optional['KerasMetadataCache'] = None,
 ) -> IFMModel:
     """
     Reads the metadata from the Keras model file and returns an IFMModel object.
+
+    If a `cache` is given, the number of layers and parameters are looked up by the
+    SHA-256 digest of the file and only extracted from files not seen before.
     """
 
     params = {
@@ -121,14 +130,43 @@ def read_keras_metadata(
         params['name'] = 'Classification IFM Model'
         params['type'] = 'classification'
 
-    # load the model and extract metadata
+    # extract metadata from the model, unless it is cached for the file content
+    summary = None
+    if cache is not None:
+        digest = file_digest(file_obj.name)
+        summary = cache.get(digest)
+    if summary is None:
+        summary = summarize_keras_model(file_obj, logger)
+        if summary is None:
+            return None
+        if cache is not None:
+            cache.put(digest, summary)
+
+    params['number_of_layers'], params['number_of_parameters'] = summary
+    return IFMModel(**params)
+
+
+def summarize_keras_model(
+    file_obj: BinaryIO, logger: 'BoundLogger'
+) -> Optional[tuple[int, int]]:
+    """
+    Returns the number of layers and parameters of a Keras model file. The model is
+    only loaded if they cannot be read from the model config and the weight shapes.
+    """
+    # read the metadata from the model config and the weight shapes
+    try:
+        return read_keras_summary(file_obj)
+    except (KeyError, TypeError, ValueError, OSError, zipfile.BadZipFile) as e:
+        logger.warn(f'Could not read the model metadata, loading the model: {e}')
+
+    # load the model and extract metadata, TensorFlow is only imported here as it
+    # takes seconds to load and is not needed for reading the xml metadata
     try:
+        import tensorflow as tf
+
         model = tf.keras.models.load_model(file_obj.name)
-        params['number_of_layers'] = len(model.layers)
-        params['number_of_parameters'] = model.count_params()
+        return len(model.layers), model.count_params()
 
     except Exception as e:
         logger.error(f'Could not load the model: {e}')
         return None
-
-    return IFMModel(**params)
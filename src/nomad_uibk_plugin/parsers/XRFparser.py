@@ -1,12 +1,16 @@
-from typing import TYPE_CHECKING
+import copy
+import os
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Any, Optional, Union
 
 from nomad.config import config
 from nomad.datamodel.data import EntryData
 from nomad.datamodel.metainfo.annotations import ELNAnnotation
 from nomad.metainfo import Quantity
 from nomad.parsing.parser import MatchingParser
-from nomad_measurements.utils import create_archive
+from nomad_measurements.utils import get_entry_id_from_file_name, get_reference
 
+from nomad_uibk_plugin.schema_packages import XRFreader
 from nomad_uibk_plugin.schema_packages.XRFschema import ELNXRayFluorescence
 
 if TYPE_CHECKING:
@@ -34,6 +38,114 @@ class XRFParser(MatchingParser):
     Parser for matching XRF files and creating instances of XRayFlourescence.
     """
 
+    # Signature of the UIBK `.txt` export searched for in the head of a file before
+    # the `mainfile_contents_re` is applied.
+    signature = b'PositionType'
+    signature_head_size = 4096
+
+    def __init__(self, split_applications: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.split_applications = split_applications
+        self.creates_children = split_applications
+
+    def is_mainfile(  # noqa: PLR0913
+        self,
+        filename: str,
+        mime: str,
+        buffer: bytes,
+        decoded_buffer: str,
+        compression: Optional[str] = None,
+    ) -> Union[bool, Iterable[str]]:
+        """
+        Staged matching of XRF files. The cheap checks of the file name and of the
+        `signature` in the first `signature_head_size` bytes reject most files, so
+        the multi-line `mainfile_contents_re` only runs on candidates.
+
+        If `split_applications` is set, the applications of a matched file are
+        returned as the keys of its child entries. They are found by scanning the
+        header lines of the measurement blocks, see
+        `XRFreader.scan_xrf_applications`.
+        """
+        if (
+            not self._mainfile_alternative
+            and self._mainfile_name_re.fullmatch(filename) is None
+        ):
+            return False
+        if (
+            buffer is None
+            or buffer.find(self.signature, 0, self.signature_head_size) < 0
+        ):
+            return False
+        is_mainfile = super().is_mainfile(
+            filename, mime, buffer, decoded_buffer, compression
+        )
+        if is_mainfile and self.split_applications:
+            return XRFreader.scan_xrf_applications(filename) or True
+        return is_mainfile
+
+    # serialized template of the `ELNXRayFluorescence` entries, built once
+    _entry_template: Optional[dict[str, Any]] = None
+
+    @classmethod
+    def entry_template(cls) -> dict[str, Any]:
+        """
+        Returns the serialized `ELNXRayFluorescence` built from the `a_template` of
+        the section. The template is only built once and shared by all entries.
+        """
+        if cls._entry_template is None:
+            entry = ELNXRayFluorescence.m_from_dict(
+                ELNXRayFluorescence.m_def.a_template
+            )
+            cls._entry_template = entry.m_to_dict(with_root_def=True)
+        return cls._entry_template
+
+    def write_archive(
+        self,
+        data: dict[str, Any],
+        archive: 'EntryArchive',
+        file_name: str,
+    ) -> bool:
+        """
+        Writes the data of a derived archive file unless it already exists.
+
+        Args:
+            data (dict[str, Any]): The serialized data section of the archive file.
+            archive (EntryArchive): The archive of the mainfile.
+            file_name (str): The name of the archive file.
+
+        Returns:
+            bool: Whether the archive file was written.
+        """
+        if archive.m_context.raw_path_exists(file_name):
+            return False
+        with archive.m_context.update_entry(
+            file_name, write=True, process=True
+        ) as entry:
+            entry['data'] = data
+        return True
+
+    def parse_file(self, mainfile: str, archive: 'EntryArchive') -> Optional[str]:
+        """
+        Populates the archive of a matched XRF file with a reference to its derived
+        `ELNXRayFluorescence` archive and writes the derived archive.
+
+        Returns:
+            Optional[str]: The name of the derived archive file if it was written.
+        """
+        data_file = mainfile.split('/')[-1]
+        entry = copy.deepcopy(self.entry_template())
+        entry['data_file'] = data_file
+        file_name = f'{"".join(data_file.split(".")[:-1])}.archive.json'
+        written = self.write_archive(entry, archive, file_name)
+        archive.data = RawFileXRFData(
+            measurement=get_reference(
+                archive.metadata.upload_id,
+                get_entry_id_from_file_name(file_name, archive),
+            )
+        )
+        archive.metadata.entry_name = f'{data_file} data file'
+        return file_name if written else None
+
     def parse(
         self,
         mainfile: str,
@@ -42,11 +154,36 @@ class XRFParser(MatchingParser):
         child_archives: dict[str, 'EntryArchive'] = None,
     ) -> None:
         logger.info('XRFParser.parse')
-        data_file = mainfile.split('/')[-1]
-        entry = ELNXRayFluorescence.m_from_dict(ELNXRayFluorescence.m_def.a_template)
-        entry.data_file = data_file
-        file_name = f'{"".join(data_file.split(".")[:-1])}.archive.json'
-        archive.data = RawFileXRFData(
-            measurement=create_archive(entry, archive, file_name)
-        )
+        if child_archives:
+            self.parse_children(mainfile, archive, child_archives)
+        else:
+            self.parse_file(mainfile, archive)
+
+    def parse_children(
+        self,
+        mainfile: str,
+        archive: 'EntryArchive',
+        child_archives: dict[str, 'EntryArchive'],
+    ) -> None:
+        """
+        Populates a child entry with an `ELNXRayFluorescence` for every application
+        of a matched XRF file, so every application is normalized and indexed as a
+        small entry of its own.
+
+        Args:
+            mainfile (str): The path of the XRF file.
+            archive (EntryArchive): The archive of the XRF file.
+            child_archives (dict[str, EntryArchive]): The archive of the child entry
+            of every application.
+        """
+        data_file = os.path.basename(mainfile)
+        for application, child_archive in child_archives.items():
+            entry = ELNXRayFluorescence.m_from_dict(
+                copy.deepcopy(self.entry_template())
+            )
+            entry.data_file = data_file
+            entry.application = application
+            child_archive.data = entry
+            child_archive.metadata.entry_name = f'{data_file} {application}'
+        archive.data = RawFileXRFData()
         archive.metadata.entry_name = f'{data_file} data file'
@@ -1,4 +1,5 @@
 from nomad.config.models.plugins import ParserEntryPoint
+from pydantic import Field
 
 
 class XRFParserEntryPoint(ParserEntryPoint):
@@ -6,6 +7,12 @@ class XRFParserEntryPoint(ParserEntryPoint):
     XRF Parser plugin entry point.
     """
 
+    split_applications: bool = Field(
+        False,
+        description='Whether to create a child entry for every application in an '
+        'XRF file instead of a single entry for all applications.',
+    )
+
     def load(self):
         # lazy import to avoid circular dependencies
         from nomad_uibk_plugin.parsers.XRFparser import XRFParser
@@ -17,7 +24,7 @@ xrfparser = XRFParserEntryPoint(
     name='XRFParser',
     description='XRF Parser for UIBK .txt files.',
     mainfile_name_re='.*\.txt',
-    mainfile_content_re='PositionType\s+Application\s+Sample\s+name\s+Date\s+\n[A-Z0-9-]+\s+Quant\s+analysis',
+    mainfile_contents_re='PositionType\s+Application\s+Sample\s+name\s+Date\s+\n[A-Z0-9-]+\s+Quant\s+analysis',
 )
 
 # # Microcell parser entry points
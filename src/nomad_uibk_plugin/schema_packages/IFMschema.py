@@ -16,13 +16,19 @@
 # limitations under the License.
 #
 
+import hashlib
+import math
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from typing import (
     TYPE_CHECKING,
+    Optional,
 )
 
-import pandas as pd
+import numpy as np
 import plotly.graph_objs as go
+from nomad.config import config
 from nomad.datamodel.data import ArchiveSection, EntryData
 from nomad.datamodel.metainfo.annotations import ELNAnnotation, ELNComponentEnum
 from nomad.datamodel.metainfo.basesections import (
@@ -32,7 +38,15 @@ from nomad.datamodel.metainfo.basesections import (
 from nomad.datamodel.metainfo.eln import ELNAnalysis, ELNMeasurement
 from nomad.datamodel.metainfo.plot import PlotlyFigure, PlotSection
 from nomad.datamodel.metainfo.workflow import Link
-from nomad.metainfo import Datetime, MEnum, Quantity, SchemaPackage, Section, SubSection
+from nomad.metainfo import (
+    Datetime,
+    MEnum,
+    MProxy,
+    Quantity,
+    SchemaPackage,
+    Section,
+    SubSection,
+)
 from nomad_measurements.utils import (
     # create_archive,
     # get_entry_id_from_file_name,
@@ -41,8 +55,21 @@ from nomad_measurements.utils import (
 )
 from pint import UnitRegistry
 
+from nomad_uibk_plugin.filereader.IFMfiles import (
+    DEFECT_CLASSES,
+    PREDICTION_READER_VERSION,
+    KerasMetadataCache,
+    PredictionCache,
+    claim_files,
+    is_claimed,
+    is_interrupted,
+    read_prediction_csv,
+    release_files,
+)
+from nomad_uibk_plugin.filereader.IFMmodels import BackgroundJobs
 from nomad_uibk_plugin.schema_packages import UIBKCategory
 from nomad_uibk_plugin.schema_packages.sample import UIBKSampleReference
+from nomad_uibk_plugin.utils import file_digest
 
 if TYPE_CHECKING:
     from nomad.datamodel import EntryArchive
@@ -50,8 +77,17 @@ if TYPE_CHECKING:
 
 ureg = UnitRegistry()
 
+configuration = config.get_plugin_entry_point(
+    'nomad_uibk_plugin.schema_packages:ifmschema'
+)
+
+# long analyses run in the background of the worker if enabled
+ifm_analysis_jobs = BackgroundJobs(configuration.analysis_workers)
+
 m_package = SchemaPackage()
 
+HEATMAP_LABEL = 'Defect Distribution Heatmap'
+
 
 class IFMMeasurement(ELNMeasurement):
     """
@@ -197,11 +233,212 @@ class IFMModel(Entity, EntryData):
 
             from nomad_uibk_plugin.filereader.IFMreader import read_keras_metadata
 
+            # the metadata of unchanged model files is read from the cache
+            cache = None
+            if configuration.model_cache_size > 0:
+                cache = KerasMetadataCache(
+                    configuration.model_cache_directory
+                    or os.path.join(config.fs.tmp, 'ifm_model_cache'),
+                    configuration.model_cache_size,
+                )
+
             with archive.m_context.raw_file(self.file, 'rb') as file:
-                model = read_keras_metadata(file, archive, logger)
+                model = read_keras_metadata(file, archive, logger, cache)
                 merge_sections(self, model, logger)
 
 
+def recognize_defects(
+    image_paths: list[str], model_binary_path: str, model_classification_path: str
+) -> None:
+    """
+    Extracts the defects of the given images and writes them to the csv files next
+    to the images. The defect recognition takes the paths of the models and loads
+    them for every image, loaded models cannot be passed to it.
+    """
+    # here we execute Georgs code to extract the defects
+    from ifm_image_defect_detection.defectRecognition_toCSV import defect_recognition
+
+    for image_path in image_paths:
+        defect_recognition(image_path, model_binary_path, model_classification_path)
+
+
+def run_analysis(
+    csv_paths: list[str],
+    image_paths: list[str],
+    model_binary_path: str,
+    model_classification_path: str,
+) -> None:
+    """
+    Extracts the defects of the given images and releases the claims of their csv
+    files afterwards, also if the extraction fails.
+    """
+    try:
+        recognize_defects(image_paths, model_binary_path, model_classification_path)
+    finally:
+        release_files(csv_paths)
+
+
+def bin_tiles(
+    x: np.ndarray,
+    y: np.ndarray,
+    labels: np.ndarray,
+    max_cells: int,
+    number_of_labels: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bins tiles onto a regular grid of at most `max_cells` cells. The tiles lie on
+    a grid spanned by their strides, which is coarsened by merging square blocks of
+    tiles into one cell until the limit is met.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The x and y centers of the cells and
+        the most frequent label of every cell, -1 for cells without tiles. Ties go to
+        the lower label.
+    """
+    if len(labels) == 0:
+        return np.empty(0), np.empty(0), np.empty((0, 0), dtype=int)
+
+    def grid(positions: np.ndarray) -> tuple[int, int, int]:
+        values = np.unique(positions)
+        step = int(np.gcd.reduce(np.diff(values))) if len(values) > 1 else 1
+        return int(values[0]), step, int(values[-1] - values[0]) // step + 1
+
+    x_start, x_step, number_of_columns = grid(x)
+    y_start, y_step, number_of_rows = grid(y)
+    factor = max(
+        1, math.ceil(math.sqrt(number_of_columns * number_of_rows / max_cells))
+    )
+    while (
+        math.ceil(number_of_columns / factor) * math.ceil(number_of_rows / factor)
+        > max_cells
+    ):
+        factor += 1
+    number_of_columns = math.ceil(number_of_columns / factor)
+    number_of_rows = math.ceil(number_of_rows / factor)
+
+    columns = (x - x_start) // x_step // factor
+    rows = (y - y_start) // y_step // factor
+    counts = np.bincount(
+        (rows * number_of_columns + columns) * number_of_labels + labels,
+        minlength=number_of_rows * number_of_columns * number_of_labels,
+    ).reshape(number_of_rows, number_of_columns, number_of_labels)
+    z = np.where(counts.any(axis=2), counts.argmax(axis=2), -1)
+
+    def centers(start: int, step: int, number_of_cells: int) -> np.ndarray:
+        return start + (np.arange(number_of_cells) * factor + (factor - 1) / 2) * step
+
+    return (
+        centers(x_start, x_step, number_of_columns),
+        centers(y_start, y_step, number_of_rows),
+        z,
+    )
+
+
+def summarize_predictions(
+    csv_path: str, prediction_cache: Optional[PredictionCache] = None
+) -> tuple[np.ndarray, dict]:
+    """
+    Reads the predicted defects of an image from its csv file and returns the
+    relative share of the defect classes and the plotly figure of their distribution.
+    The archive is not modified, so several images can be summarized in parallel.
+    """
+    # read csv file and extract the defect prevalence
+    x, y, labels = read_prediction_csv(csv_path, prediction_cache)
+    relative_share = np.bincount(labels, minlength=len(DEFECT_CLASSES)) / max(
+        len(labels), 1
+    )
+
+    # create plot, the tiles are binned to keep the figure small
+    if configuration.heatmap_max_cells > 0:
+        x_cells, y_cells, z = bin_tiles(
+            x, y, labels, configuration.heatmap_max_cells, len(DEFECT_CLASSES)
+        )
+        heatmap_data = dict(x=x_cells, y=y_cells, z=np.where(z < 0, np.nan, z + 1))
+    else:
+        heatmap_data = dict(x=x, y=y, z=labels + 1)
+
+    heatmap = go.Heatmap(
+        **heatmap_data,
+        colorscale='Viridis',
+        colorbar=dict(
+            tickvals=[1, 2, 3, 4],
+            ticktext=list(DEFECT_CLASSES),
+            title='Defect Type',
+        ),
+    )
+
+    figure = go.Figure(data=heatmap)
+    figure.update_layout(
+        title='Heatmap of Defect Distribution',
+        xaxis_title='X Position',
+        yaxis_title='Y Position',
+        xaxis=dict(scaleanchor='y'),
+        yaxis=dict(scaleanchor='x'),
+        autosize=True,
+    )
+
+    figure_json = figure.to_plotly_json()
+    figure_json['config'] = {'staticPlot': True}
+    # the cell matrix is passed to plotly as array, which is validated much faster
+    # than nested lists, and stored with empty cells as null
+    if configuration.heatmap_max_cells > 0:
+        figure_json['data'][0]['z'] = np.where(z < 0, None, z + 1).tolist()
+    return relative_share, figure_json
+
+
+@lru_cache(maxsize=1024)
+def _csv_digest(path: str, mtime_ns: int, size: int) -> str:
+    return file_digest(path)
+
+
+def prediction_fingerprint(csv_path: str) -> str:
+    """
+    Returns the fingerprint of a prediction csv file and of the settings its result
+    is built with. The digest of the file is only calculated again if its path,
+    modification time or size changes.
+    """
+    path = os.path.realpath(csv_path)
+    stat = os.stat(path)
+    digest = _csv_digest(path, stat.st_mtime_ns, stat.st_size)
+    return hashlib.sha256(
+        f'{digest}:{PREDICTION_READER_VERSION}:{configuration.heatmap_max_cells}'.encode()
+    ).hexdigest()
+
+
+def _link_key(link: Link) -> tuple:
+    # references that are not resolved yet are identified by their url
+    section = link.section
+    if isinstance(section, MProxy):
+        return link.name, section.m_proxy_value
+    return link.name, id(section)
+
+
+def workflow_links(existing: list[Link], desired: list[Link]) -> list[Link]:
+    """
+    Returns the desired workflow links in their order without duplicates. Existing
+    links with the same name and section are kept instead of the new ones, links
+    that are not desired anymore are dropped.
+    """
+    existing_links = {}
+    for link in existing:
+        existing_links.setdefault(_link_key(link), link)
+    links = {}
+    for link in desired:
+        key = _link_key(link)
+        if key not in links:
+            links[key] = existing_links.get(key, link)
+    return list(links.values())
+
+
+def prediction_csv_path(image_path: str) -> str:
+    """
+    Returns the path of the csv file with the predicted defects of an image.
+    """
+    path, filename_with_ext = os.path.split(image_path)
+    filename, ext = os.path.splitext(filename_with_ext)
+    return os.path.join(path, f'{filename}_prediction.csv')
+
+
 class DefectPrevalence(ArchiveSection):
     whiskers = Quantity(
         type=float,
@@ -222,11 +459,22 @@ class DefectPrevalence(ArchiveSection):
 
 
 class IFMAnalysisResult(ArchiveSection):
+    name = Quantity(
+        type=str,
+        description='Name of the result.',
+    )
     file = Quantity(
         type=str,
         description='File containing the data.',
         a_eln=ELNAnnotation(component=ELNComponentEnum.FileEditQuantity),
     )
+    fingerprint = Quantity(
+        type=str,
+        description=(
+            'Fingerprint of the content of the file and of the settings the result '
+            'was built with. Results with an unchanged fingerprint are not rebuilt.'
+        ),
+    )
 
     defect_prevalence = SubSection(
         section_def=DefectPrevalence,
@@ -309,134 +557,237 @@ class IFMTwoStepAnalysis(ELNAnalysis, PlotSection):
         default=False,
         a_eln=ELNAnnotation(component=ELNComponentEnum.BoolEditQuantity),
     )
+    analysis_status = Quantity(
+        type=MEnum('queued', 'running', 'finished', 'failed'),
+        description='Status of the last analysis triggered by "perform analysis".',
+    )
+    analysis_message = Quantity(
+        type=str,
+        description='Error message of the last analysis if it failed.',
+    )
 
-    def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger'):
-        super().normalize(archive, logger)
-        self.method = 'IFM Two Step Analysis'
+    def start_analysis(self, archive: 'EntryArchive', logger: 'BoundLogger') -> bool:
+        """
+        Extracts the defects of all inputs without a csv file or with the csv file of
+        an interrupted analysis. In the asynchronous mode, the extraction is
+        submitted to the background jobs of the worker and its status is recorded in
+        `analysis_status`, the csv files are picked up by a later normalize. The csv
+        files are claimed for the analysis by claim files next to them, so no other
+        worker analyzes the same inputs.
+
+        Returns:
+            bool: Whether the analysis is still pending.
+        """
+        key = archive.metadata.entry_id or archive.metadata.mainfile
+        job_status = ifm_analysis_jobs.status(key)
+        if job_status in {'queued', 'running'}:
+            self.analysis_status = job_status
+            logger.info(f'The analysis is {job_status}.')
+            return True
+        if job_status is not None:
+            error = ifm_analysis_jobs.pop(key).exception()
+            self.analysis_status = job_status
+            self.analysis_message = None if error is None else str(error)
+            if error is not None:
+                logger.error(f'The analysis failed: {error}')
+            return False
+
+        image_paths = []
+        for input in self.inputs:
+            with archive.m_context.raw_file(input.reference.image_file) as image_file:
+                csv_path = prediction_csv_path(image_file.name)
+                if not os.path.exists(csv_path) or is_interrupted(
+                    csv_path, configuration.analysis_timeout
+                ):
+                    image_paths.append(image_file.name)
+        if not image_paths:
+            return False
+
+        model_paths = []
+        for reference in (self.model_binary, self.model_classification):
+            with archive.m_context.raw_file(reference.reference.file) as model_file:
+                model_paths.append(model_file.name)
+
+        csv_paths = [prediction_csv_path(image_path) for image_path in image_paths]
+        if not claim_files(csv_paths, configuration.analysis_timeout):
+            self.analysis_status = 'running'
+            logger.info('The analysis is running in another worker.')
+            return True
+
+        self.analysis_message = None
+        if configuration.asynchronous_analysis:
+            try:
+                self.analysis_status = ifm_analysis_jobs.submit(
+                    key, run_analysis, csv_paths, image_paths, *model_paths
+                )
+            except BaseException:
+                release_files(csv_paths)
+                raise
+            logger.info(f'Submitted the analysis of {len(image_paths)} images.')
+            return True
+
+        logger.info('Extracting defects...')
+        run_analysis(csv_paths, image_paths, *model_paths)
+        self.analysis_status = 'finished'
+        return False
+
+    def update_outputs(self, csv_paths: list[str]):
+        """
+        Updates the outputs and heatmaps with the results of the given prediction csv
+        files in their order. The results of csv files with an unchanged fingerprint
+        are kept, only new or changed csv files are read.
+        """
+        # predictions of unchanged csv files are read from a binary copy
+        prediction_cache = None
+        if configuration.prediction_cache_size > 0:
+            prediction_cache = PredictionCache(
+                configuration.prediction_cache_directory
+                or os.path.join(config.fs.tmp, 'ifm_prediction_cache'),
+                configuration.prediction_cache_size,
+            )
+
+        # results of unchanged csv files are kept with their figures, the heatmaps
+        # of the last normalize are the last figures in the order of the outputs
+        heatmaps = [figure for figure in self.figures if figure.label == HEATMAP_LABEL]
+        previous_results = {}
+        if self.outputs and len(heatmaps) >= len(self.outputs):
+            for output, figure in zip(
+                self.outputs, heatmaps[len(heatmaps) - len(self.outputs) :]
+            ):
+                previous_results.setdefault(
+                    (output.file, output.fingerprint), []
+                ).append((output, figure))
+        fingerprints = [prediction_fingerprint(csv_path) for csv_path in csv_paths]
+        kept_results = []
+        for csv_path, fingerprint in zip(csv_paths, fingerprints):
+            previous = previous_results.get((csv_path, fingerprint))
+            kept_results.append(previous.pop(0) if previous else None)
+        changed_paths = list(
+            dict.fromkeys(
+                csv_path
+                for csv_path, kept_result in zip(csv_paths, kept_results)
+                if kept_result is None
+            )
+        )
+
+        # the csv files are read in parallel if enabled, the results are added in
+        # the order of the inputs
+        summarize = partial(summarize_predictions, prediction_cache=prediction_cache)
+        if configuration.analysis_threads > 1 and len(changed_paths) > 1:
+            with ThreadPoolExecutor(
+                min(configuration.analysis_threads, len(changed_paths))
+            ) as executor:
+                summaries = dict(
+                    zip(changed_paths, executor.map(summarize, changed_paths))
+                )
+        else:
+            summaries = {csv_path: summarize(csv_path) for csv_path in changed_paths}
+
+        outputs = []
+        figures = []
+        for csv_path, fingerprint, kept_result in zip(
+            csv_paths, fingerprints, kept_results
+        ):
+            if kept_result is not None:
+                analysis_entry, figure = kept_result
+            else:
+                # create result subsection
+                relative_share, figure_json = summaries[csv_path]
+                analysis_entry = IFMAnalysisResult(
+                    name='Extracted Features',
+                    file=csv_path,
+                    fingerprint=fingerprint,
+                )
+                analysis_entry.defect_prevalence = DefectPrevalence(
+                    whiskers=relative_share[0],
+                    chipping=relative_share[1],
+                    scratch=relative_share[2],
+                    no_error=relative_share[3],
+                )
+                figure = PlotlyFigure(
+                    label=HEATMAP_LABEL,
+                    index=0,
+                    figure=figure_json,
+                )
+
+            # add the result to the analysis output
+            outputs.append(analysis_entry)
+            figures.append(figure)
+
+        self.outputs = outputs
+        self.figures = [
+            figure for figure in self.figures if figure.label != HEATMAP_LABEL
+        ] + figures
 
-        # workflow linking
+    def update_workflow(self, archive: 'EntryArchive'):
+        """
+        Links the images, the models and the results in the workflow of the entry.
+        Links that are already there are kept, so normalizing again does not add
+        links.
+        """
+        inputs = [
+            Link(name=input.name, section=input.reference) for input in self.inputs
+        ]
         if self.model_binary:
-            archive.workflow2.inputs.append(
+            inputs.append(
                 Link(name='Binary Model', section=self.model_binary.reference)
             )
         if self.model_classification:
-            archive.workflow2.inputs.append(
+            inputs.append(
                 Link(
                     name='Classification Model',
                     section=self.model_classification.reference,
                 )
             )
+        outputs = [Link(name=output.name, section=output) for output in self.outputs]
+        archive.workflow2.inputs = workflow_links(archive.workflow2.inputs, inputs)
+        archive.workflow2.outputs = workflow_links(archive.workflow2.outputs, outputs)
+
+    def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger'):
+        super().normalize(archive, logger)
+        self.method = 'IFM Two Step Analysis'
 
         # check if all necessary inputs are given
         if self.inputs and self.model_binary and self.model_classification:
             logger.info('Two Models found. Ready for IFM Two Step Analysis.')
 
-            self.outputs = []
-            for input in self.inputs:
-                # here we execute Georgs code to extract the defects
-                with (
-                    archive.m_context.raw_file(
-                        input.reference.image_file
-                    ) as image_file,
-                    archive.m_context.raw_file(
-                        self.model_binary.reference.file
-                    ) as model_binary,
-                    archive.m_context.raw_file(
-                        self.model_classification.reference.file
-                    ) as model_classiciation,
-                ):
-                    # create paths and names for the csv file and archive file
-                    path, filename_with_ext = os.path.split(image_file.name)
-                    filename, ext = os.path.splitext(filename_with_ext)
-                    csv_path = os.path.join(path, f'{filename}_prediction.csv')
-                    # csv_archive_name = f'{filename}_prediction.archive.json'
-
-                    # perform the analysis if the csv file does not yet exist and
-                    # the user has checked the box
-                    if self.perform_analysis and not os.path.exists(csv_path):
-                        logger.info('Extracting defects...')
-                        from ifm_image_defect_detection.defectRecognition_toCSV import (
-                            defect_recognition,
-                        )
-
-                        defect_recognition(
-                            image_file.name, model_binary.name, model_classiciation.name
-                        )
+            if self.perform_analysis:
+                self.perform_analysis = self.start_analysis(archive, logger)
 
+            csv_paths = []
+            for input in self.inputs:
+                with archive.m_context.raw_file(
+                    input.reference.image_file
+                ) as image_file:
+                    csv_paths.append(prediction_csv_path(image_file.name))
+
+            # the csv files of a pending analysis may be partially written, so the
+            # outputs are only updated once the analysis of all inputs is done
+            if self.perform_analysis or any(
+                is_claimed(csv_path, configuration.analysis_timeout)
+                for csv_path in csv_paths
+            ):
+                logger.info('The analysis is pending.')
+            else:
+                existing_paths = []
+                for csv_path in csv_paths:
                     if not os.path.exists(csv_path):
                         logger.warn(
-                            'The csv file does not exist. Please (re)run the analysis '
-                            'by checking "perform analysis" (again).'
+                            'The csv file does not exist. Please (re)run the '
+                            'analysis by checking "perform analysis" (again).'
                         )
                         continue
-
-                    # create result subsection
-                    analysis_entry = IFMAnalysisResult(file=csv_path)
-
-                    # read csv file and extract the defect prevalence
-                    defect_data = pd.read_csv(csv_path, skiprows=2)
-                    defect_columns = ['Whiskers', 'Chipping', 'Scratch', 'No Error']
-                    defect_data['type'] = defect_data[defect_columns].idxmax(axis=1)
-                    relative_share = defect_data['type'].value_counts(normalize=True)
-
-                    analysis_entry.defect_prevalence = DefectPrevalence(
-                        whiskers=relative_share.get('Whiskers', 0),
-                        chipping=relative_share.get('Chipping', 0),
-                        scratch=relative_share.get('Scratch', 0),
-                        no_error=relative_share.get('No Error', 0),
-                    )
-
-                    # add the result to the analysis output and update the workflow
-                    self.outputs.append(analysis_entry)
-                    archive.workflow2.outputs.append(
-                        Link(
-                            name='Extracted Features',
-                            section=analysis_entry,
-                        )
-                    )
-
-                    # create plot
-                    defect_mapping = {
-                        'Whiskers': 1,
-                        'Chipping': 2,
-                        'Scratch': 3,
-                        'No Error': 4,
-                    }
-                    defect_data['label'] = defect_data['type'].map(defect_mapping)
-
-                    heatmap = go.Heatmap(
-                        x=defect_data['x'],
-                        y=defect_data['y'],
-                        z=defect_data['label'],
-                        colorscale='Viridis',
-                        colorbar=dict(
-                            tickvals=[1, 2, 3, 4],
-                            ticktext=defect_columns,
-                            title='Defect Type',
-                        ),
-                    )
-
-                    figure = go.Figure(data=heatmap)
-                    figure.update_layout(
-                        title='Heatmap of Defect Distribution',
-                        xaxis_title='X Position',
-                        yaxis_title='Y Position',
-                        xaxis=dict(scaleanchor='y'),
-                        yaxis=dict(scaleanchor='x'),
-                        autosize=True,
-                    )
-
-                    figure_json = figure.to_plotly_json()
-                    figure_json['config'] = {'staticPlot': True}
-                    self.figures.append(
-                        PlotlyFigure(
-                            label='Defect Distribution Heatmap',
-                            index=0,
-                            figure=figure_json,
+                    if is_interrupted(csv_path, configuration.analysis_timeout):
+                        logger.warn(
+                            'The analysis writing the csv file was interrupted. '
+                            'Please rerun the analysis by checking "perform '
+                            'analysis" again.'
                         )
-                    )
+                        continue
+                    existing_paths.append(csv_path)
+                self.update_outputs(existing_paths)
 
-            self.perform_analysis = False
+        self.update_workflow(archive)
 
 
 m_package.__init_metainfo__()
@@ -16,18 +16,84 @@
 # limitations under the License.
 #
 
+import hashlib
+import io
+import json
+import locale
+import mmap
+import os
+import pickle
 import re
+import zlib
+from collections import OrderedDict
+from collections.abc import Collection, Iterable, Iterator
 from datetime import datetime
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Optional
 
-# import numpy as np
+import numpy as np
 from nomad.units import ureg
 
+from nomad_uibk_plugin.utils import file_digest
+
 if TYPE_CHECKING:
     from structlog.stdlib import (
         BoundLogger,
     )
 
+# Row labels of the UIBK `.txt` export and the label of the row that has to follow
+# for the tokens of a row to be collected under the given key.
+XRF_TXT_ROWS = {
+    'names': ('Component', 'Analyzed value'),
+    'values': ('Analyzed value', 'Unit'),
+    'units': ('Unit', 'Component'),
+    'int_peak_elements': ('Component', 'Element line'),
+    'int_peak_lines': ('Element line', 'Peak intensity'),
+    'int_peak_values': ('Peak intensity', 'BG intensity'),
+    'int_background_lines': ('Element line', 'Peak/BG'),
+    'int_background_types': ('Peak/BG', 'Meas. intensity'),
+}
+XRF_TXT_LABELS = (
+    'Component',
+    'Analyzed value',
+    'Unit',
+    'Element line',
+    'Peak intensity',
+    'BG intensity',
+    'Peak/BG',
+    'Meas. intensity',
+)
+
+# Compiled patterns used for parsing the UIBK `.txt` export
+XRF_TXT_PATTERNS = {
+    'separator': re.compile(r'_{100,}\n'),
+    'separator_bytes': re.compile(rb'_{100,}(?:\r\n|\r|\n)'),
+    'meta_bytes': re.compile(rb'PositionType[^\r\n]*(?:\r\n|\r|\n)[^\r\n]*'),
+    'meta': re.compile(
+        r'PositionType\s+Application\s+Sample name\s+Date\s+(\S+)\s+'
+        r'Quant analysis\s+(\S+(?:\s\S+)*)\s+(\S+)\s+'
+        r'(\d{4}-\s*\d{1,2}-\s*\d{1,2}\s+\d{1,2}:\d{2})'
+    ),
+    'row': re.compile(
+        r'\s*('
+        + '|'.join(re.escape(label) for label in XRF_TXT_LABELS)
+        + r')\s+(\S.*)',
+        re.DOTALL,
+    ),
+    'line': re.compile(r'([A-Z][a-z]{0,2})-\S+'),
+}
+
+# Stoichiometric ratios of the atomic fractions in a layer by name with the elements
+# summed in the numerator and the denominator, see `CompositionRatios`.
+XRF_RATIOS = {
+    'GGI': (('Ga',), ('Ga', 'In')),
+    'CGI': (('Cu',), ('Ga', 'In')),
+    'SSSe': (('S',), ('S', 'Se')),
+}
+
+# Version of the output of `iter_xrf_measurements`, part of the keys of the
+# `XRFParseCache`. Has to be increased whenever the output of the reader changes.
+XRF_READER_VERSION = 1
+
 
 def group_composition_into_layers(
     layers: dict = {},
@@ -77,6 +143,62 @@ def group_composition_into_layers(
     return layers
 
 
+def index_intensity_lines(lines: Iterable[str]) -> dict[str, list[str]]:
+    """
+    Function for building an index from elements to their intensity lines. The
+    element is parsed from the line label, e.g. `Cu` from `Cu-Ka`.
+
+    Args:
+        lines (Iterable[str]): The labels of the intensity lines.
+
+    Returns:
+        dict[str, list[str]]: The lines of each element in their original order.
+    """
+    line_index = dict()
+    for line in lines:
+        match = XRF_TXT_PATTERNS['line'].fullmatch(line)
+        if match:
+            line_index.setdefault(match.group(1), []).append(line)
+    return line_index
+
+
+def match_intensity_line(
+    element: str,
+    line_index: dict[str, list[str]],
+    lines: Iterable[str],
+    strict: bool = False,
+    logger: 'BoundLogger' = None,
+) -> str:
+    """
+    Function for finding the intensity line of an element.
+
+    Args:
+        element (str): The element to find the line for.
+        line_index (dict[str, list[str]]): The index built by `index_intensity_lines`.
+        lines (Iterable[str]): All labels of the intensity lines.
+        strict (bool): If set, only lines whose label starts with the element are
+        considered and ambiguous matches are not assigned. Otherwise, elements
+        without such a line fall back to the lines containing the element and the
+        last matching line is used.
+        logger (BoundLogger): A structlog logger.
+
+    Returns:
+        str: The matching line or `None` if no line matches.
+    """
+    candidates = line_index.get(element, [])
+    if not candidates and not strict:
+        candidates = [line for line in lines if element in line]
+    if len(candidates) > 1:
+        if logger is not None:
+            logger.warn(
+                f'read_UIBK_txt found multiple intensity lines {candidates} for '
+                f'element "{element}".'
+            )
+        if strict:
+            return None
+    return candidates[-1] if candidates else None
+
+
 def sort_intensity_values_into_layers(  # noqa: PLR0913
     layers: dict = {},
     int_peak_elements: list = [],
@@ -85,6 +207,9 @@ def sort_intensity_values_into_layers(  # noqa: PLR0913
     int_background_lines: list = [],
     int_background_types: list = [],
     int_background_values: list = [],
+    *,
+    strict: bool = False,
+    logger: 'BoundLogger' = None,
 ) -> dict:
     """
     Function for sorting the intensity values into layers.
@@ -97,6 +222,9 @@ def sort_intensity_values_into_layers(  # noqa: PLR0913
         int_background_lines (list): The lines of the background intensity values.
         int_background_types (list): The types of the background intensity values.
         int_background_values (list): The values of the background intensity values.
+        strict (bool): Whether to only assign unambiguous lines of the element, see
+        `match_intensity_line`.
+        logger (BoundLogger): A structlog logger.
 
     Returns:
         dict: Updated dictionary with the intensity values sorted into layers.
@@ -120,197 +248,1044 @@ def sort_intensity_values_into_layers(  # noqa: PLR0913
             int_dict[line]['BG2'] = bg
 
     # Sort intensity values into layers
+    line_index = index_intensity_lines(int_dict)
     for layer in layers.values():
         for element, content in layer['elements'].items():
-            for line, int_values in int_dict.items():
-                if element in line:
-                    content['line'] = line
-                    content['intensity_peak'] = int_values.get('peak')
-                    content['intensity_background'] = int_values.get('BG1')
-                    content['intensity_background_2'] = int_values.get('BG2')
+            line = match_intensity_line(element, line_index, int_dict, strict, logger)
+            if line is not None:
+                int_values = int_dict[line]
+                content['line'] = line
+                content['intensity_peak'] = int_values.get('peak')
+                content['intensity_background'] = int_values.get('BG1')
+                content['intensity_background_2'] = int_values.get('BG2')
 
     return layers
 
 
-def read_xrf_txt(file_path: str, logger: 'BoundLogger' = None) -> dict[str, Any]:  # noqa: PLR0915, PLR0912
+def _xrf_layer_dtype(name_width: int = 1) -> np.dtype:
     """
-    Function for reading the X-ray fluorescence data in a UIBK `.txt` file.
+    Returns the dtype of the structured array holding the layers of a measurement.
+    """
+    return np.dtype(
+        [
+            ('name', f'U{max(name_width, 1)}'),
+            ('thickness', np.float64),
+            ('unit', 'U16'),
+        ]
+    )
+
+
+def _xrf_element_dtype(element_width: int = 1, line_width: int = 1) -> np.dtype:
+    """
+    Returns the dtype of the structured array holding the elements of a measurement.
+    """
+    return np.dtype(
+        [
+            ('element', f'U{max(element_width, 1)}'),
+            ('layer', np.int64),
+            ('fraction', np.float64),
+            ('atomic', np.bool_),
+            ('line', f'U{max(line_width, 1)}'),
+            ('peak', np.float64),
+            ('BG1', np.float64),
+            ('BG2', np.float64),
+        ]
+    )
+
+
+def group_composition_into_columns(  # noqa: PLR0915
+    names: list,
+    values: list,
+    units: list,
+    logger: 'BoundLogger' = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Columnar counterpart of `group_composition_into_layers`. The composition data is
+    grouped into layers with vectorized operations on NumPy arrays.
 
     Args:
-        file_path (str): The path to the `.txt` file.
+        names (list): The names of the layers and elements.
+        values (list): The thicknesses of the layers and the shares of the elements.
+        units (list): The units of the values.
         logger (BoundLogger): A structlog logger.
 
     Returns:
-        dict[str, Any]: The X-ray fluorescence data in a Python dictionary.
+        tuple[np.ndarray, np.ndarray]: A structured array of the layers (`name`,
+        `thickness`, `unit`) and a structured array of the elements (`element`,
+        `layer` index, `fraction`, `atomic`, `line`, `peak`, `BG1`, `BG2`).
     """
+    # rows of different lengths are truncated to the shortest row, like the zip in
+    # `group_composition_into_layers`
+    length = min(len(names), len(values), len(units))
+    names = np.asarray(names[:length], dtype=str)
+    values = np.asarray(values[:length], dtype=np.float64)
+    units = np.asarray(units[:length], dtype=str)
 
-    with open(file_path) as file:
-        data = file.read()
+    is_layer = np.char.find(units, '%') < 0
+    layer_rows = np.flatnonzero(is_layer)
+    layer_of = np.cumsum(is_layer) - 1
+    layer_names = names[layer_rows]
+    is_element = ~is_layer & (layer_of >= 0)
+    if np.any(~is_layer & (layer_of < 0)) and logger is not None:
+        logger.warn('read_UIBK_txt found elements without a layer.')
 
-    xrf_dict = dict()
-
-    # Splitting data into individual measurements
-    measurements = re.split(r'_{100,}\n', data)
-    for measurement in measurements:
-        if len(measurement) > 100:  # noqa: PLR2004
-            # Try to match meta information
-            meta_match = re.search(
-                (
-                    r'PositionType\s+Application\s+Sample name\s+Date\s+(\S+)\s+'
-                    r'Quant analysis\s+(\S+(?:\s\S+)*)\s+(\S+)\s+'
-                    r'(\d{4}-\s*\d{1,2}-\s*\d{1,2}\s+\d{1,2}:\d{2})'
-                ),
-                measurement,
+    # Elements behind a metal layer that do not belong to it form the substrate
+    layer_index = layer_of.copy()
+    insert_substrate = None
+    metal_layers = np.flatnonzero(
+        np.char.find(np.char.lower(layer_names), 'layer') >= 0
+    )
+    if metal_layers.size and layer_rows.size:
+        current_names = layer_names[np.maximum(layer_of, 0)]
+        outside = is_element & (layer_of >= metal_layers[0])
+        outside &= np.char.find(current_names, names) < 0
+        if np.any(outside):
+            first = np.argmax(outside)
+            insert_substrate = layer_of[first] + 1
+            in_substrate = (np.arange(names.size) >= first) & (
+                layer_of == layer_of[first]
             )
+            layer_index[layer_of >= insert_substrate] += 1
+            layer_index[in_substrate] = insert_substrate
 
-            # Try to match layers/elements and their thickness/shares
-            names_match = re.findall(r'Component\s+(.*?)\s+Analyzed value', measurement)
-            values_match = re.findall(r'Analyzed value\s+(.*?)\s+Unit', measurement)
-            units_match = re.findall(r'Unit\s+(.*?)\s+Component', measurement)
+    # Only elements with a known unit are kept
+    is_mass = units == 'mass%'
+    is_atomic = units == 'at%'
+    unknown = is_element & ~is_mass & ~is_atomic
+    if np.any(unknown) and logger is not None:
+        logger.warn('read_UIBK_txt found unknown unit "{unit}" in file: "{file_path}"')
+    is_element &= ~unknown
 
-            # Try to match peak intensity values
-            int_peak_elements_match = re.findall(
-                r'Component\s+(.*?)\s+Element line', measurement
-            )
-            int_peak_lines_match = re.findall(
-                r'Element line\s+(.*?)\s+Peak intensity', measurement
-            )
-            int_peak_values_match = re.findall(
-                r'Peak intensity\s+(.*?)\s+BG intensity', measurement
+    layer_names = list(layer_names)
+    thicknesses = list(values[layer_rows])
+    layer_units = list(units[layer_rows])
+    if insert_substrate is not None:
+        layer_names.insert(insert_substrate, 'Substrate')
+        thicknesses.insert(insert_substrate, np.nan)
+        layer_units.insert(insert_substrate, '')
+    layers = np.empty(
+        len(layer_names),
+        dtype=_xrf_layer_dtype(max((len(name) for name in layer_names), default=1)),
+    )
+    layers['name'] = layer_names
+    layers['thickness'] = thicknesses
+    layers['unit'] = layer_units
+
+    element_names = names[is_element]
+    elements = np.empty(
+        element_names.size,
+        dtype=_xrf_element_dtype(element_names.dtype.itemsize // 4),
+    )
+    elements['element'] = element_names
+    elements['layer'] = layer_index[is_element]
+    elements['fraction'] = values[is_element]
+    elements['atomic'] = is_atomic[is_element]
+    elements['line'] = ''
+    elements['peak'] = np.nan
+    elements['BG1'] = np.nan
+    elements['BG2'] = np.nan
+    return layers, elements
+
+
+def sort_intensity_values_into_columns(  # noqa: PLR0913
+    elements: np.ndarray,
+    *,
+    int_peak_elements: list,
+    int_peak_lines: list,
+    int_peak_values: list,
+    int_background_lines: list,
+    int_background_types: list,
+    int_background_values: list,
+    strict: bool = False,
+    logger: 'BoundLogger' = None,
+) -> np.ndarray:
+    """
+    Columnar counterpart of `sort_intensity_values_into_layers`. The intensity
+    values are matched to all elements at once and are passed by keyword.
+
+    Args:
+        elements (np.ndarray): The structured array of the elements.
+        int_peak_elements (list): The elements of the peak intensity values.
+        int_peak_lines (list): The lines of the peak intensity values.
+        int_peak_values (list): The values of the peak intensity values.
+        int_background_lines (list): The lines of the background intensity values.
+        int_background_types (list): The types of the background intensity values.
+        int_background_values (list): The values of the background intensity values.
+        strict (bool): Whether to only assign unambiguous lines of the element, see
+        `match_intensity_line`.
+        logger (BoundLogger): A structlog logger.
+
+    Returns:
+        np.ndarray: The structured array of the elements with the `line`, `peak`,
+        `BG1` and `BG2` fields filled in.
+    """
+    line_rows = dict()
+    peaks = []
+    for line, _, peak in zip(int_peak_lines, int_peak_elements, int_peak_values):
+        peaks.append((line_rows.setdefault(line, len(line_rows)), peak))
+    lines = np.array(list(line_rows), dtype=str)
+    intensities = np.full((len(line_rows), 3), np.nan)
+    for row, peak in peaks:
+        intensities[row, 0] = peak
+    for line, bg_type, bg in zip(
+        int_background_lines, int_background_types, int_background_values
+    ):
+        if bg_type in ('BG1', 'BG2'):
+            intensities[line_rows[line], 1 if bg_type == 'BG1' else 2] = bg
+
+    if not elements.size or not lines.size:
+        return elements
+
+    # Look up the line of every distinct element once
+    line_index = index_intensity_lines(line_rows)
+    unique_elements, inverse = np.unique(elements['element'], return_inverse=True)
+    unique_rows = np.full(unique_elements.size, -1, dtype=np.int64)
+    for i, element in enumerate(unique_elements.tolist()):
+        line = match_intensity_line(element, line_index, line_rows, strict, logger)
+        if line is not None:
+            unique_rows[i] = line_rows[line]
+    rows = unique_rows[inverse.ravel()]
+    matched = rows >= 0
+
+    result = np.empty(
+        elements.size,
+        dtype=_xrf_element_dtype(
+            elements.dtype['element'].itemsize // 4, lines.dtype.itemsize // 4
+        ),
+    )
+    for field in elements.dtype.names:
+        result[field] = elements[field]
+    result['line'][matched] = lines[rows[matched]]
+    for column, field in enumerate(('peak', 'BG1', 'BG2')):
+        result[field][matched] = intensities[rows[matched], column]
+    return result
+
+
+def delete_empty_layers_from_columns(
+    layers: np.ndarray, elements: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Removes the layers with a thickness of 0 and their elements from the columnar
+    representation.
+
+    Args:
+        layers (np.ndarray): The structured array of the layers.
+        elements (np.ndarray): The structured array of the elements.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The filtered layers and elements.
+    """
+    keep = layers['thickness'] != 0
+    new_index = np.cumsum(keep) - 1
+    elements = elements[keep[elements['layer']]]
+    elements['layer'] = new_index[elements['layer']]
+    return layers[keep], elements
+
+
+def columns_to_layers(layers: np.ndarray, elements: np.ndarray) -> dict:
+    """
+    Converts the columnar representation into the dictionary returned by
+    `group_composition_into_layers` and `sort_intensity_values_into_layers`.
+
+    Args:
+        layers (np.ndarray): The structured array of the layers.
+        elements (np.ndarray): The structured array of the elements.
+
+    Returns:
+        dict: The data grouped into layers.
+    """
+    layer_names = layers['name'].tolist()
+    layers_dict = dict()
+    for name, thickness, unit in layers.tolist():
+        layers_dict[name] = dict()
+        if unit:
+            layers_dict[name]['thickness'] = thickness * ureg(unit)
+
+    for element, layer, fraction, atomic, line, peak, bg1, bg2 in elements.tolist():
+        content = layers_dict[layer_names[layer]].setdefault('elements', dict())
+        if atomic:
+            content[element] = dict(atomic_fraction=fraction)
+        else:
+            content[element] = dict(mass_fraction=fraction)
+        if line:
+            content[element]['line'] = line
+            content[element]['intensity_peak'] = None if np.isnan(peak) else peak
+            content[element]['intensity_background'] = None if np.isnan(bg1) else bg1
+            content[element]['intensity_background_2'] = None if np.isnan(bg2) else bg2
+    return layers_dict
+
+
+def _split_row(line: str) -> tuple[str, str]:
+    """
+    Splits a line of a measurement block into its row label and its content.
+
+    Args:
+        line (str): The line to split.
+
+    Returns:
+        tuple[str, str]: The row label (`None` if the line is not a known row) and
+        the remaining content of the line.
+    """
+    match = XRF_TXT_PATTERNS['row'].match(line)
+    if match is None:
+        return None, line.strip()
+    return match.group(1), match.group(2).strip()
+
+
+def tokenize_xrf_txt(file_obj: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """
+    Generator for tokenizing a UIBK `.txt` file in a single pass over its lines.
+
+    Only the rows of the current measurement block are kept in memory. Each yielded
+    block contains the number of characters in the block (`length`), the text of the
+    meta information rows (`meta`) and for every key of `XRF_TXT_ROWS` (and
+    `int_background_values`) the list of rows, each as a list of tokens.
+
+    Args:
+        file_obj (Iterable[str]): The lines of the `.txt` file.
+
+    Yields:
+        dict[str, Any]: The rows of a single measurement block.
+    """
+
+    def new_block() -> dict[str, Any]:
+        block = {key: [] for key in XRF_TXT_ROWS}
+        block['int_background_values'] = []
+        block['length'] = 0
+        block['meta'] = None
+        return block
+
+    block = new_block()
+    previous_label = None
+    previous_tokens = []
+    in_meta = False
+
+    for raw_line in file_obj:
+        separator = XRF_TXT_PATTERNS['separator'].search(raw_line)
+        line = raw_line if separator is None else raw_line[: separator.start()]
+        block['length'] += len(line)
+
+        if in_meta and line.strip():
+            block['meta'] += line
+            in_meta = False
+        elif 'PositionType' in line and block['meta'] is None:
+            block['meta'] = line
+            in_meta = True
+
+        label, content = _split_row(line)
+        if label is not None:
+            tokens = content.split()
+            for key, (row, next_row) in XRF_TXT_ROWS.items():
+                if previous_label == row and label == next_row:
+                    block[key].append(previous_tokens)
+            if label == 'Meas. intensity' and line.endswith('\n'):
+                block['int_background_values'].append(tokens)
+            previous_label, previous_tokens = label, tokens
+        elif content:
+            previous_label, previous_tokens = None, []
+
+        if separator is not None:
+            yield block
+            block = new_block()
+            previous_label = None
+            previous_tokens = []
+            in_meta = False
+
+    yield block
+
+
+def _iter_mapped_blocks(file_path: str) -> Iterator[str]:
+    """
+    Generator for the text of the measurement blocks in a memory-mapped file. The
+    block separators are located by scanning the bytes of the file, so only one
+    block at a time is decoded.
+    """
+    encoding = locale.getpreferredencoding(False)
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            start = 0
+            for separator in XRF_TXT_PATTERNS['separator_bytes'].finditer(buffer):
+                yield buffer[start : separator.start()].decode(encoding)
+                start = separator.end()
+            yield buffer[start:].decode(encoding)
+
+
+def iter_xrf_blocks(
+    file_path: str, memory_map: bool = False
+) -> Iterator[dict[str, Any]]:
+    """
+    Generator for the tokenized measurement blocks of a UIBK `.txt` file, see
+    `tokenize_xrf_txt`.
+
+    Args:
+        file_path (str): The path to the `.txt` file.
+        memory_map (bool): Whether to memory-map the file and split it into blocks
+        on the bytes instead of reading it line by line.
+
+    Yields:
+        dict[str, Any]: The rows of a single measurement block.
+    """
+    if not memory_map:
+        with open(file_path) as file:
+            yield from tokenize_xrf_txt(file)
+        return
+
+    for text in _iter_mapped_blocks(file_path):
+        yield from tokenize_xrf_txt(io.StringIO(text, newline=None))
+
+
+def _build_layers(
+    rows: dict[str, list], strict: bool = False, logger: 'BoundLogger' = None
+) -> dict:
+    """
+    Groups the tokenized rows of a measurement block into layers and removes the
+    layers with a thickness of 0.
+    """
+    layers = {}
+    layers = group_composition_into_layers(
+        layers, rows['names'], rows['values'], rows['units'], logger
+    )
+    layers = sort_intensity_values_into_layers(
+        layers,
+        rows['int_peak_elements'],
+        rows['int_peak_lines'],
+        rows['int_peak_values'],
+        rows['int_background_lines'],
+        rows['int_background_types'],
+        rows['int_background_values'],
+        strict=strict,
+        logger=logger,
+    )
+
+    # Delete layers with thickness 0
+    layers_to_delete = []
+    for layer_key, layer in layers.items():
+        try:
+            if layer['thickness'] == 0:
+                layers_to_delete.append(layer_key)
+        except KeyError:
+            pass
+    for key in layers_to_delete:
+        del layers[key]
+
+    return layers
+
+
+def _build_columns(
+    rows: dict[str, list], strict: bool = False, logger: 'BoundLogger' = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Columnar counterpart of `_build_layers`.
+    """
+    layers, elements = group_composition_into_columns(
+        rows['names'], rows['values'], rows['units'], logger
+    )
+    elements = sort_intensity_values_into_columns(
+        elements,
+        int_peak_elements=rows['int_peak_elements'],
+        int_peak_lines=rows['int_peak_lines'],
+        int_peak_values=rows['int_peak_values'],
+        int_background_lines=rows['int_background_lines'],
+        int_background_types=rows['int_background_types'],
+        int_background_values=rows['int_background_values'],
+        strict=strict,
+        logger=logger,
+    )
+    return delete_empty_layers_from_columns(layers, elements)
+
+
+class _WarningCollector:
+    """
+    Logger replacement collecting the warnings of reading a file, so they can be
+    logged again when the file is loaded from the cache. If a logger is given, the
+    warnings are passed on to it as well.
+    """
+
+    def __init__(self, logger: 'BoundLogger' = None):
+        self.messages = []
+        self.logger = logger
+
+    def warn(self, message: str, *args, **kwargs) -> None:
+        self.messages.append(message)
+        if self.logger is not None:
+            self.logger.warn(message, *args, **kwargs)
+
+    warning = warn
+
+
+def _read_block(
+    block: dict[str, Any], logger: 'BoundLogger' = None
+) -> Optional[tuple[str, str, datetime, dict[str, list]]]:
+    """
+    Extracts the metadata and the flattened rows of a tokenized measurement block.
+
+    Returns:
+        Optional[tuple[str, str, datetime, dict[str, list]]]: The application, sample
+        name, date and rows or `None` if the block is incomplete.
+    """
+    if block['length'] <= 100:  # noqa: PLR2004
+        return None
+
+    # Try to match meta information
+    meta_match = None
+    if block['meta'] is not None:
+        meta_match = XRF_TXT_PATTERNS['meta'].search(block['meta'])
+
+    # Check if all necessary information was found
+    if not (
+        meta_match
+        and all(block[key] for key in XRF_TXT_ROWS)
+        and block['int_background_values']
+    ):
+        if logger is not None:
+            logger.warn(
+                'read_UIBK_txt failed to extract all necessary information '
+                'from file: "{file_path}"'
             )
+        return None
+
+    # Extract metadata
+    application = meta_match.group(2).strip()
+    sample_name = meta_match.group(3).strip()
+    # workaround for missing zeros
+    # e.g. '2024- 3- 3  9:33' -> '2024- 3- 3 T9:33' -> '2024-3-3T9:33'
+    date = 'T'.join(meta_match.group(4).strip().rsplit(' ', 1))
+    date = datetime.strptime(date.replace(' ', ''), '%Y-%m-%dT%H:%M')
+
+    # Extract elements, shares and intensity values
+    rows = {
+        key: [token for row in block[key] for token in row]
+        for key in (*XRF_TXT_ROWS, 'int_background_values')
+    }
+    for key in ('values', 'int_peak_values', 'int_background_values'):
+        rows[key] = [float(value) for value in rows[key]]
 
-            # Try to match background intensity values
-            int_background_lines_match = re.findall(
-                r'Element line\s+(.*?)\s+Peak/BG', measurement
+    # Check if all intensity values have the same length
+    if not all(
+        (
+            len(rows['int_peak_elements'])
+            == len(rows['int_peak_lines'])
+            == len(rows['int_peak_values']),
+            len(rows['int_background_lines'])
+            == len(rows['int_background_types'])
+            == len(rows['int_background_values']),
+        )
+    ):
+        if logger is not None:
+            logger.warn(
+                'read_UIBK_txt found inconsistent number of '
+                'intensity values in file: "{file_path}"'
             )
-            int_background_types_match = re.findall(
-                r'Peak/BG\s+(.*?)\s+Meas. intensity', measurement
+
+    return application, sample_name, date, rows
+
+
+def _build_measurement(  # noqa: PLR0913
+    application: str,
+    sample_name: str,
+    date: datetime,
+    rows: dict[str, list],
+    *,
+    columnar: bool = False,
+    strict: bool = False,
+    logger: 'BoundLogger' = None,
+) -> dict[str, Any]:
+    """
+    Builds the measurement dictionary yielded by `iter_xrf_measurements`.
+    """
+    measurement = dict(
+        application=application,
+        sample_name=sample_name,
+        date=date,
+    )
+    if columnar:
+        measurement['layers'], measurement['elements'] = _build_columns(
+            rows, strict, logger
+        )
+    else:
+        measurement['layers'] = _build_layers(rows, strict, logger)
+    return measurement
+
+
+def _detach_units(layers: dict[str, Any]) -> dict[str, Any]:
+    """
+    Returns a copy of the layers with the thicknesses as tuples of magnitude and
+    unit, as pint quantities lose their unit registry when being pickled.
+    """
+    detached = dict(layers)
+    for name, layer in layers.items():
+        if 'thickness' in layer:
+            thickness = layer['thickness']
+            detached[name] = dict(
+                layer, thickness=(thickness.magnitude, str(thickness.units))
             )
-            int_background_values_match = re.findall(
-                r'Meas. intensity\s+(.*?)\n', measurement
+    return detached
+
+
+def _attach_units(layers: dict[str, Any], units: dict[str, Any]) -> None:
+    """
+    Converts the thicknesses detached by `_detach_units` back to pint quantities.
+    The parsed units are shared through `units`.
+    """
+    for layer in layers.values():
+        if 'thickness' in layer:
+            magnitude, unit = layer['thickness']
+            if unit not in units:
+                units[unit] = ureg(unit)
+            layer['thickness'] = magnitude * units[unit]
+
+
+def iter_xrf_measurements(  # noqa: PLR0913
+    file_path: str,
+    logger: 'BoundLogger' = None,
+    *,
+    columnar: bool = False,
+    strict: bool = False,
+    memory_map: bool = False,
+    cache: Optional['XRFParseCache'] = None,
+    applications: Optional[Collection[str]] = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Generator for lazily reading the X-ray fluorescence data in a UIBK `.txt` file.
+
+    Yields one measurement at a time, so neither the whole file nor all measurements
+    have to be kept in memory. Only the first measurement of every application is
+    yielded and layers with a thickness of 0 are removed.
+
+    Args:
+        file_path (str): The path to the `.txt` file.
+        logger (BoundLogger): A structlog logger.
+        columnar (bool): Whether to return the layers and elements as structured
+        NumPy arrays (see `group_composition_into_columns`) instead of nested
+        dictionaries. They can be converted with `columns_to_layers`.
+        strict (bool): Whether to only assign unambiguous intensity lines whose label
+        starts with the element, see `match_intensity_line`.
+        memory_map (bool): Whether to memory-map the file instead of reading it line
+        by line, see `iter_xrf_blocks`.
+        cache (Optional[XRFParseCache]): A cache of parsed files. If the content of
+        the file has been read before, the measurements are loaded from the cache
+        instead of parsing the file again.
+        applications (Optional[Collection[str]]): The applications to yield. All
+        applications are yielded if not given.
+
+    Yields:
+        dict[str, Any]: A measurement with the keys `application`, `sample_name`,
+        `date` and `layers` (and `elements` if `columnar` is set).
+    """
+    if cache is not None:
+        yield from cache.iter_xrf_measurements(
+            file_path,
+            logger,
+            columnar=columnar,
+            strict=strict,
+            memory_map=memory_map,
+            applications=applications,
+        )
+        return
+
+    read_applications = set()
+    for block in iter_xrf_blocks(file_path, memory_map):
+        read = _read_block(block, logger)
+        if read is None:
+            continue
+
+        # Check if application is not already in dictionary
+        application = read[0]
+        if application in read_applications:
+            if logger is not None:
+                logger.warn(
+                    'read_UIBK_txt found duplicate application "{application}"'
+                    ' in file: "{file_path}".'
+                )
+            continue
+
+        read_applications.add(application)
+        if applications is None or application in applications:
+            yield _build_measurement(
+                *read, columnar=columnar, strict=strict, logger=logger
             )
 
-            # Check if all necessary information was found
-            if all(
-                (
-                    meta_match,
-                    names_match,
-                    values_match,
-                    units_match,
-                    int_peak_elements_match,
-                    int_peak_lines_match,
-                    int_peak_values_match,
-                    int_background_lines_match,
-                    int_background_types_match,
-                    int_background_values_match,
+
+def scan_xrf_applications(file_path: str) -> list[str]:
+    """
+    Returns the applications in a UIBK `.txt` file in the order of the file by only
+    matching the header lines of the measurement blocks in the memory-mapped file.
+
+    No block is tokenized, so this is cheap enough for matching files. The
+    applications of incomplete blocks are included.
+
+    Args:
+        file_path (str): The path to the `.txt` file.
+
+    Returns:
+        list[str]: The applications of all measurement blocks.
+    """
+    encoding = locale.getpreferredencoding(False)
+    applications = dict()
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for header in XRF_TXT_PATTERNS['meta_bytes'].finditer(buffer):
+                meta_match = XRF_TXT_PATTERNS['meta'].search(
+                    header.group().decode(encoding)
                 )
-            ):
-                # Extract metadata
-                application = meta_match.group(2).strip()
-                sample_name = meta_match.group(3).strip()
-                # workaround for missing zeros
-                # e.g. '2024- 3- 3  9:33' -> '2024- 3- 3 T9:33' -> '2024-3-3T9:33'
-                date = 'T'.join(meta_match.group(4).strip().rsplit(' ', 1))
-                date = datetime.strptime(date.replace(' ', ''), '%Y-%m-%dT%H:%M')
-
-                # Extract elements and shares
-                names = [name for line in names_match for name in line.split()]
-                values = [
-                    float(value) for line in values_match for value in line.split()
-                ]
-                units = [unit for line in units_match for unit in line.split()]
-
-                # Extract intensity values
-                int_peak_elements = [
-                    element
-                    for line in int_peak_elements_match
-                    for element in line.split()
-                ]
-                int_peak_lines = [
-                    element for line in int_peak_lines_match for element in line.split()
-                ]
-                int_peak_values = [
-                    float(element)
-                    for line in int_peak_values_match
-                    for element in line.split()
-                ]
-                int_background_lines = [
-                    element
-                    for line in int_background_lines_match
-                    for element in line.split()
-                ]
-                int_background_types = [
-                    element
-                    for line in int_background_types_match
-                    for element in line.split()
-                ]
-                int_background_values = [
-                    float(element)
-                    for line in int_background_values_match
-                    for element in line.split()
-                ]
-
-                # Check if all intensity values have the same length
-                if not all(
-                    (
-                        len(int_peak_elements)
-                        == len(int_peak_lines)
-                        == len(int_peak_values),
-                        len(int_background_lines)
-                        == len(int_background_types)
-                        == len(int_background_values),
-                    )
-                ):
-                    if logger is not None:
-                        logger.warn(
-                            'read_UIBK_txt found inconsistent number of '
-                            'intensity values in file: "{file_path}"'
-                        )
-
-                # Check if application is not already in dictionary
-                if application not in xrf_dict:
-                    # Group data into layers
-                    layers = {}
-                    layers = group_composition_into_layers(
-                        layers, names, values, units, logger
-                    )
-                    layers = sort_intensity_values_into_layers(
-                        layers,
-                        int_peak_elements,
-                        int_peak_lines,
-                        int_peak_values,
-                        int_background_lines,
-                        int_background_types,
-                        int_background_values,
-                    )
+                if meta_match is not None:
+                    applications.setdefault(meta_match.group(2).strip())
+    return list(applications)
+
+
+def read_xrf_txt(
+    file_path: str,
+    logger: 'BoundLogger' = None,
+    *,
+    columnar: bool = False,
+    strict: bool = False,
+    memory_map: bool = False,
+) -> dict[str, Any]:
+    """
+    Function for reading the X-ray fluorescence data in a UIBK `.txt` file.
+
+    Args:
+        file_path (str): The path to the `.txt` file.
+        logger (BoundLogger): A structlog logger.
+        columnar (bool): Whether to return the layers and elements as structured
+        NumPy arrays instead of nested dictionaries.
+        strict (bool): Whether to only assign unambiguous intensity lines whose label
+        starts with the element.
+        memory_map (bool): Whether to memory-map the file instead of reading it line
+        by line.
+
+    Returns:
+        dict[str, Any]: The X-ray fluorescence data in a Python dictionary.
+    """
+    return {
+        measurement['application']: measurement
+        for measurement in iter_xrf_measurements(
+            file_path,
+            logger,
+            columnar=columnar,
+            strict=strict,
+            memory_map=memory_map,
+        )
+    }
+
+
+class XRFParseCache:
+    """
+    Bounded in-memory LRU cache for the measurements read from XRF files.
+
+    The entries are keyed by the SHA-256 digest of the file content, the
+    `XRF_READER_VERSION` and the reader options changing the output, so an unchanged
+    file is only parsed once. Every measurement is stored as a compressed pickle
+    together with the warnings of reading the file, which are logged again on a cache
+    hit. The least recently used entries are evicted once the total size exceeds
+    `max_size` bytes or the number of entries exceeds `max_entries`.
+
+    Args:
+        max_size (int): The maximum total size of the cached measurements in bytes.
+        Files whose measurements are larger are not cached.
+        max_entries (int): The maximum number of cached files.
+    """
+
+    def __init__(self, max_size: int = 64 * 2**20, max_entries: int = 128):
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.size = 0
+        self._entries: OrderedDict[
+            tuple, tuple[list[tuple[str, bytes]], list[str], int]
+        ] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache.
+        """
+        self._entries.clear()
+        self.size = 0
+
+    def _put(
+        self,
+        key: tuple,
+        records: list[tuple[str, bytes]],
+        messages: list[str],
+        size: int,
+    ) -> None:
+        """
+        Adds an entry and evicts the least recently used entries exceeding the limits.
+        """
+        if size > self.max_size or self.max_entries < 1:
+            return
+        while self._entries and (
+            self.size + size > self.max_size or len(self._entries) >= self.max_entries
+        ):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+        self._entries[key] = (records, messages, size)
+        self.size += size
 
-                    # Fill dictionary with data
-                    xrf_dict[application] = dict()
-                    xrf_dict[application]['application'] = application
-                    xrf_dict[application]['sample_name'] = sample_name
-                    xrf_dict[application]['date'] = date
-                    xrf_dict[application]['layers'] = layers
-                elif logger is not None:
-                    logger.warn(
-                        'read_UIBK_txt found duplicate application "{application}"'
-                        ' in file: "{file_path}".'
+    def _load(
+        self,
+        key: tuple,
+        logger: 'BoundLogger' = None,
+        columnar: bool = False,
+        applications: Optional[Collection[str]] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Loads the measurements of a cached file and logs the warnings of reading it.
+        """
+        self._entries.move_to_end(key)
+        records, messages, _ = self._entries[key]
+        if logger is not None:
+            for message in messages:
+                logger.warn(message)
+        units = dict()
+        for application, record in records:
+            if applications is not None and application not in applications:
+                continue
+            measurement = pickle.loads(zlib.decompress(record))
+            if not columnar:
+                _attach_units(measurement['layers'], units)
+            yield measurement
+
+    def iter_xrf_measurements(  # noqa: PLR0913
+        self,
+        file_path: str,
+        logger: 'BoundLogger' = None,
+        *,
+        columnar: bool = False,
+        strict: bool = False,
+        memory_map: bool = False,
+        applications: Optional[Collection[str]] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Cached version of `iter_xrf_measurements`. On a cache miss, the measurements
+        of all applications are stored once the file has been read completely. On a
+        cache hit, only the measurements of the given `applications` are loaded.
+        """
+        key = (file_digest(file_path), XRF_READER_VERSION, columnar, strict)
+        if key in self._entries:
+            yield from self._load(key, logger, columnar, applications)
+            return
+
+        records = []
+        size = 0
+        collector = _WarningCollector(logger)
+        for measurement in iter_xrf_measurements(
+            file_path,
+            collector,
+            columnar=columnar,
+            strict=strict,
+            memory_map=memory_map,
+        ):
+            if records is not None:
+                detached = measurement
+                if not columnar:
+                    detached = dict(
+                        measurement, layers=_detach_units(measurement['layers'])
                     )
-            elif logger is not None:
-                logger.warn(
-                    'read_UIBK_txt failed to extract all necessary information '
-                    'from file: "{file_path}"'
-                )
+                record = zlib.compress(pickle.dumps(detached, pickle.HIGHEST_PROTOCOL))
+                size += len(record)
+                # files exceeding the size of the cache are not cached
+                if size > self.max_size:
+                    records = None
+                else:
+                    records.append((measurement['application'], record))
+            if applications is None or measurement['application'] in applications:
+                yield measurement
+        if records is not None:
+            self._put(key, records, collector.messages, size)
 
-    # Delete layers with thickness 0
-    for application in xrf_dict.values():
-        layers_to_delete = []
-        for layer_key, layer in application['layers'].items():
-            try:
-                if layer['thickness'] == 0:
-                    layers_to_delete.append(layer_key)
-            except KeyError:
-                pass
-        for key in layers_to_delete:
-            del application['layers'][key]
-
-    return xrf_dict
+
+def _fingerprint_default(obj: Any) -> Any:
+    """
+    Converts the values of a measurement that are not JSON serializable.
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def fingerprint_measurement(measurement: dict[str, Any]) -> str:
+    """
+    Returns the SHA-256 hex digest of a measurement yielded by
+    `iter_xrf_measurements`, which only changes if the measurement changes.
+
+    Args:
+        measurement (dict[str, Any]): The measurement.
+
+    Returns:
+        str: The fingerprint of the measurement.
+    """
+    serialized = json.dumps(measurement, default=_fingerprint_default)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def elemental_composition_columns(
+    measurement: dict[str, Any],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the elements of all layers of a measurement with their atomic and mass
+    fractions and the index of their layer as flat arrays. Missing fractions are
+    `NaN`.
+
+    Args:
+        measurement (dict[str, Any]): A measurement yielded by
+        `iter_xrf_measurements`, either as nested dictionaries or columnar.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The element symbols,
+        atomic fractions, mass fractions and layer indices.
+    """
+    if 'elements' in measurement:
+        elements = measurement['elements']
+        fractions = elements['fraction']
+        atomic = elements['atomic']
+        return (
+            elements['element'],
+            np.where(atomic, fractions, np.nan),
+            np.where(atomic, np.nan, fractions),
+            elements['layer'],
+        )
+
+    symbols = []
+    atomic_fractions = []
+    mass_fractions = []
+    layer_indices = []
+    for index, layer in enumerate(measurement.get('layers', {}).values()):
+        for element, attributes in layer.get('elements', {}).items():
+            symbols.append(element)
+            atomic_fractions.append(attributes.get('atomic_fraction'))
+            mass_fractions.append(attributes.get('mass_fraction'))
+            layer_indices.append(index)
+    return (
+        np.array(symbols, dtype=str),
+        np.array(atomic_fractions, dtype=np.float64),
+        np.array(mass_fractions, dtype=np.float64),
+        np.array(layer_indices, dtype=np.int64),
+    )
+
+
+class CompositionRatios:
+    """
+    Vectorized calculation of stoichiometric ratios of the atomic fractions of the
+    elements in a layer, e.g. GGI = Ga/(Ga+In).
+
+    The ratios of any number of layers are calculated in one pass over a matrix of
+    the atomic fractions of the elements involved. Missing elements count as 0 and
+    ratios with a denominator of 0 are `NaN`. The ratios are cached per layer with
+    the row of the matrix as fingerprint, so identical layers are only calculated
+    once. The least recently used entries are evicted once there are more than
+    `max_entries`.
+
+    Args:
+        ratios (dict[str, tuple[tuple[str, ...], tuple[str, ...]]]): The elements
+        summed in the numerator and the denominator of every ratio by name.
+        Defaults to `XRF_RATIOS`.
+        max_entries (int): The maximum number of cached layers.
+    """
+
+    def __init__(
+        self,
+        ratios: Optional[dict[str, tuple[tuple[str, ...], tuple[str, ...]]]] = None,
+        max_entries: int = 2**16,
+    ):
+        self.ratios = XRF_RATIOS if ratios is None else ratios
+        self.max_entries = max_entries
+        self.elements = np.array(
+            sorted(
+                {
+                    element
+                    for numerator, denominator in self.ratios.values()
+                    for element in (*numerator, *denominator)
+                }
+            ),
+            dtype=str,
+        )
+        self._numerators = np.array(
+            [
+                np.isin(self.elements, numerator)
+                for numerator, _ in self.ratios.values()
+            ],
+            dtype=np.float64,
+        ).reshape(len(self.ratios), self.elements.size)
+        self._denominators = np.array(
+            [
+                np.isin(self.elements, denominator)
+                for _, denominator in self.ratios.values()
+            ],
+            dtype=np.float64,
+        ).reshape(len(self.ratios), self.elements.size)
+        self._cache: OrderedDict[bytes, np.ndarray] = OrderedDict()
+
+    def fractions(
+        self,
+        symbols: np.ndarray,
+        atomic_fractions: np.ndarray,
+        layers: np.ndarray,
+        number_of_layers: int,
+    ) -> np.ndarray:
+        """
+        Returns the matrix of the atomic fractions of the elements of the ratios with
+        one row per layer. If an element occurs more than once in a layer, the last
+        fraction is used. Missing elements and fractions are 0.
+        """
+        matrix = np.zeros((number_of_layers, self.elements.size))
+        if not self.elements.size or not symbols.size:
+            return matrix
+        columns = np.searchsorted(self.elements, symbols)
+        columns = np.minimum(columns, self.elements.size - 1)
+        known = self.elements[columns] == symbols
+        cells = (layers * self.elements.size + columns)[known]
+        values = np.nan_to_num(atomic_fractions[known])
+        # the last fraction of every cell
+        unique_cells, reversed_index = np.unique(cells[::-1], return_index=True)
+        matrix.flat[unique_cells] = values[::-1][reversed_index]
+        return matrix
+
+    def __call__(
+        self,
+        symbols: np.ndarray,
+        atomic_fractions: np.ndarray,
+        layers: np.ndarray,
+        number_of_layers: int,
+    ) -> dict[str, np.ndarray]:
+        """
+        Calculates the ratios of all layers.
+
+        Args:
+            symbols (np.ndarray): The element symbols of all compositions.
+            atomic_fractions (np.ndarray): The atomic fractions, `NaN` if missing.
+            layers (np.ndarray): The index of the layer of every composition.
+            number_of_layers (int): The number of layers.
+
+        Returns:
+            dict[str, np.ndarray]: The ratio of every layer by name.
+        """
+        matrix = self.fractions(symbols, atomic_fractions, layers, number_of_layers)
+        rows, inverse = np.unique(matrix, axis=0, return_inverse=True)
+        keys = [row.tobytes() for row in rows]
+        missing = [index for index, key in enumerate(keys) if key not in self._cache]
+        if missing:
+            numerators = rows[missing] @ self._numerators.T
+            denominators = rows[missing] @ self._denominators.T
+            values = np.divide(
+                numerators,
+                denominators,
+                out=np.full_like(numerators, np.nan),
+                where=denominators != 0,
+            )
+            for index, row_values in zip(missing, values):
+                self._cache[keys[index]] = row_values
+        for key in keys:
+            self._cache.move_to_end(key)
+        ratios = np.array([self._cache[key] for key in keys], dtype=np.float64).reshape(
+            rows.shape[0], len(self.ratios)
+        )[inverse.reshape(-1)]
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return {name: ratios[:, index] for index, name in enumerate(self.ratios)}
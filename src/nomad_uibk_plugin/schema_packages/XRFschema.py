@@ -28,13 +28,17 @@ if TYPE_CHECKING:
         BoundLogger,
     )
 
+from collections.abc import Iterable
+from functools import partial
 from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
+    Union,
 )
 
 import numpy as np
+from ase.data import atomic_masses, atomic_numbers, chemical_symbols
 from nomad.config import config
 from nomad.datamodel.data import (
     ArchiveSection,
@@ -51,12 +55,15 @@ from nomad.datamodel.metainfo.basesections import (
     MeasurementResult,
     ReadableIdentifiers,
 )
+from nomad.datamodel.results import ElementalComposition as ResultsElementalComposition
 from nomad.datamodel.results import (
+    Material,
     Properties,
     Results,
     StructuralProperties,
 )
 from nomad.metainfo import Datetime, Quantity, SchemaPackage, Section, SubSection
+from nomad.units import ureg
 from nomad_measurements.utils import merge_sections
 
 from nomad_uibk_plugin.schema_packages import UIBKCategory, XRFreader
@@ -68,6 +75,14 @@ configuration = config.get_plugin_entry_point(
     'nomad_uibk_plugin.schema_packages:xrfschema'
 )
 
+# the ratios of the layers are cached, so identical layers are only calculated once
+xrf_composition_ratios = XRFreader.CompositionRatios()
+
+# parsed files are cached, so re-normalizing an entry does not parse the file again
+xrf_parse_cache = XRFreader.XRFParseCache(
+    configuration.parse_cache_size, configuration.parse_cache_entries
+)
+
 m_package = SchemaPackage(name='nomad_xrf')
 
 
@@ -153,6 +168,12 @@ class CIGSLayer(XRFLayer):
         description='Copper to Gallium+Indium ratio',
     )
 
+    SSSe = Quantity(
+        type=np.dtype(np.float64),
+        a_eln=dict(component='NumberEditQuantity'),
+        description='Sulfur to Sulfur+Selenium ratio',
+    )
+
 
 class XRFResult(MeasurementResult):
     """
@@ -167,6 +188,11 @@ class XRFResult(MeasurementResult):
         description='Date of the measurement',
     )
 
+    fingerprint = Quantity(
+        type=str,
+        description='Fingerprint of the parsed data the result was written from',
+    )
+
 
 class XRFSettings(ArchiveSection):
     """
@@ -239,6 +265,91 @@ class XRayFluorescence(Measurement):
         super().normalize(archive, logger)
 
 
+def normalize_elemental_compositions(
+    symbols: np.ndarray,
+    atomic_fractions: np.ndarray,
+    mass_fractions: np.ndarray,
+    archive: 'EntryArchive',
+    logger: 'BoundLogger',
+) -> None:
+    """
+    Batched counterpart of `ElementalComposition.normalize`. Adds the elements and
+    their fractions to `archive.results.material` once for all elemental
+    compositions instead of once per section. As in the sequential normalization, the
+    fractions of the last composition of every element are used.
+
+    Args:
+        symbols (np.ndarray): The element symbols of all compositions.
+        atomic_fractions (np.ndarray): The atomic fractions, `NaN` if missing.
+        mass_fractions (np.ndarray): The mass fractions, `NaN` if missing.
+        archive (EntryArchive): The archive containing the compositions.
+        logger (BoundLogger): A structlog logger.
+    """
+    if not symbols.size:
+        return
+    if not archive.results:
+        archive.results = Results()
+    if not archive.results.material:
+        archive.results.material = Material()
+    material = archive.results.material
+
+    valid = np.isin(symbols, chemical_symbols)
+    for symbol in np.unique(symbols[~valid]).tolist():
+        logger.warn(
+            f"'{symbol}' is not a valid element symbol and this "
+            'elemental_composition section will be ignored.'
+        )
+    symbols = symbols[valid]
+    atomic_fractions = atomic_fractions[valid]
+    mass_fractions = mass_fractions[valid]
+
+    # elements in the order of their first composition
+    unique, first = np.unique(symbols, return_index=True)
+    new_elements = [
+        symbol
+        for symbol in unique[np.argsort(first)].tolist()
+        if symbol not in material.elements
+    ]
+    if new_elements:
+        material.elements = [*material.elements, *new_elements]
+
+    # compositions with a non-zero fraction, missing fractions are unset
+    has_fraction = (np.nan_to_num(atomic_fractions) != 0) | (
+        np.nan_to_num(mass_fractions) != 0
+    )
+    symbols = symbols[has_fraction]
+    atomic_fractions = atomic_fractions[has_fraction].astype(object)
+    atomic_fractions[np.isnan(atomic_fractions.astype(np.float64))] = None
+    mass_fractions = mass_fractions[has_fraction].astype(object)
+    mass_fractions[np.isnan(mass_fractions.astype(np.float64))] = None
+    unique, first, inverse = np.unique(symbols, return_index=True, return_inverse=True)
+    last = np.zeros(unique.size, dtype=np.int64)
+    np.maximum.at(last, inverse, np.arange(symbols.size))
+
+    existing_compositions = {}
+    for composition in material.elemental_composition:
+        existing_compositions.setdefault(composition.element, composition)
+    for index in np.argsort(first).tolist():
+        symbol = str(unique[index])
+        atomic_fraction = atomic_fractions[last[index]]
+        mass_fraction = mass_fractions[last[index]]
+        mass = atomic_masses[atomic_numbers[symbol]] * ureg.amu
+        composition = existing_compositions.get(symbol)
+        if composition is None:
+            material.elemental_composition.append(
+                ResultsElementalComposition(
+                    element=symbol,
+                    atomic_fraction=atomic_fraction,
+                    mass_fraction=mass_fraction,
+                    mass=mass,
+                )
+            )
+        else:
+            composition.atomic_fraction = atomic_fraction
+            composition.mass_fraction = mass_fraction
+            composition.mass = mass
+
+
 class ELNXRayFluorescence(XRayFluorescence, EntryData):
     """
     Example section for how XRayFluorescence can be implemented with a general reader
@@ -264,6 +375,15 @@ class ELNXRayFluorescence(XRayFluorescence, EntryData):
         ),
     )
 
+    application = Quantity(
+        type=str,
+        description='Application of the data file to read. All applications are '
+        'read if not set.',
+        a_eln=ELNAnnotation(
+            component=ELNComponentEnum.StringEditQuantity,
+        ),
+    )
+
     measurement_identifiers = SubSection(
         section_def=ReadableIdentifiers,
     )
@@ -277,108 +397,270 @@ class ELNXRayFluorescence(XRayFluorescence, EntryData):
         """
         # TODO: Reader selection must be more specific
         if self.data_file.endswith('.txt'):
-            return XRFreader.read_xrf_txt
+            options = dict(columnar=True)
+            if configuration.parse_cache_size > 0:
+                options['cache'] = xrf_parse_cache
+            if self.application is not None:
+                options['applications'] = {self.application}
+            return partial(XRFreader.iter_xrf_measurements, **options)
+
+    def write_composition_ratios(
+        self,
+        layers: list[XRFLayer],
+        symbols: np.ndarray,
+        atomic_fractions: np.ndarray,
+        layer_indices: np.ndarray,
+    ) -> None:
+        """
+        Calculates the ratios of `XRFreader.XRF_RATIOS` for all layers at once and
+        sets them on the layers defining a quantity of the same name, like the
+        `CIGSLayer`. Undefined ratios are not set.
+
+        Args:
+            layers (list[XRFLayer]): The layers.
+            symbols (np.ndarray): The element symbols of all compositions.
+            atomic_fractions (np.ndarray): The atomic fractions, `NaN` if missing.
+            layer_indices (np.ndarray): The index in `layers` of every composition.
+        """
+        ratios = xrf_composition_ratios(
+            symbols, atomic_fractions, layer_indices, len(layers)
+        )
+        for name, values in ratios.items():
+            for layer, value in zip(layers, values.tolist()):
+                if name in layer.m_def.all_quantities and not np.isnan(value):
+                    setattr(layer, name, value)
+
+    def build_xrf_result(
+        self, data: dict[str, Any], archive: 'EntryArchive', logger: 'BoundLogger'
+    ) -> XRFResult:
+        """
+        Builds the `XRFResult` of a single measurement of a reader. The elemental
+        compositions are not normalized, see `normalize_elemental_compositions`, and
+        the composition ratios are not set, see `write_composition_ratios`.
+
+        Args:
+            data (dict[str, Any]): The measurement.
+            archive (EntryArchive): The archive containing the section.
+            logger (BoundLogger): A structlog logger.
+
+        Returns:
+            XRFResult: The normalized result.
+        """
+        if 'elements' in data:
+            return self.build_xrf_result_from_columns(data, archive, logger)
+
+        # create list of XRFLayers each with a list of XRFElementalCompositions
+        list_of_XRFLayers = []
+        for layer, content in data.get('layers', []).items():
+            list_of_ElementalCompositions = []
+            for element, attributes in content.get('elements', {}).items():
+                xel = XRFElementalComposition(
+                    element=element,
+                    mass_fraction=attributes.get('mass_fraction'),
+                    atomic_fraction=attributes.get('atomic_fraction'),
+                    line=attributes.get('line'),
+                    intensity_peak=attributes.get('intensity_peak'),
+                    intensity_background=attributes.get('intensity_background'),
+                    intensity_background_2=attributes.get('intensity_background_2'),
+                )
+                list_of_ElementalCompositions.append(xel)
+            layer_class = CIGSLayer if layer == 'CIGS' else XRFLayer
+            list_of_XRFLayers.append(
+                layer_class(
+                    name=layer,
+                    thickness=content.get('thickness', None),
+                    elements=list_of_ElementalCompositions,
+                )
+            )
+
+        result = XRFResult(
+            name=data.get('application', None),
+            date=data.get('date', None),
+            layer=list_of_XRFLayers,
+        )
+        result.normalize(archive, logger)
+        return result
 
-    def calculate_GGI_CGI(self, list_of_ElementalCompositions) -> tuple[float, float]:
+    def build_xrf_result_from_columns(
+        self, data: dict[str, Any], archive: 'EntryArchive', logger: 'BoundLogger'
+    ) -> XRFResult:
         """
-        Calculate GGI and CGI from the list of ElementalCompositions.
+        Builds the `XRFResult` of a single measurement of a reader in the columnar
+        representation (see `XRFreader.group_composition_into_columns`). The
+        sections are built in bulk from the rows of the arrays and only the
+        quantities present in the file are set.
 
         Args:
-            list_of_ElementalCompositions (list[XRFElementalComposition]): List of
-            ElementalCompositions.
+            data (dict[str, Any]): The columnar measurement.
+            archive (EntryArchive): The archive containing the section.
+            logger (BoundLogger): A structlog logger.
 
         Returns:
-            tuple[float, float]: GGI and CGI values.
+            XRFResult: The normalized result.
         """
-        gallium = 0
-        indium = 0
-        copper = 0
-        for element in list_of_ElementalCompositions:
-            if element.element == 'Ga':
-                gallium = element.atomic_fraction
-            elif element.element == 'In':
-                indium = element.atomic_fraction
-            elif element.element == 'Cu':
-                copper = element.atomic_fraction
-        GGI = gallium / (gallium + indium)
-        CGI = copper / (gallium + indium)
-        return GGI, CGI
-
-    def write_xrf_data(
+        layers = data['layers']
+        list_of_ElementalCompositions = [[] for _ in range(layers.size)]
+        for row in data['elements'].tolist():
+            element, layer, fraction, atomic, line, peak, bg1, bg2 = row
+            quantities = dict(element=element)
+            quantities['atomic_fraction' if atomic else 'mass_fraction'] = fraction
+            if line:
+                quantities['line'] = line
+                for name, value in (
+                    ('intensity_peak', peak),
+                    ('intensity_background', bg1),
+                    ('intensity_background_2', bg2),
+                ):
+                    if not np.isnan(value):
+                        quantities[name] = value
+            list_of_ElementalCompositions[layer].append(
+                XRFElementalComposition(**quantities)
+            )
+
+        # create list of XRFLayers each with a list of XRFElementalCompositions
+        list_of_XRFLayers = []
+        units = dict()
+        for (layer, magnitude, unit), elements in zip(
+            layers.tolist(), list_of_ElementalCompositions
+        ):
+            thickness = None
+            if unit:
+                if unit not in units:
+                    units[unit] = ureg(unit)
+                thickness = magnitude * units[unit]
+            layer_class = CIGSLayer if layer == 'CIGS' else XRFLayer
+            list_of_XRFLayers.append(
+                layer_class(name=layer, thickness=thickness, elements=elements)
+            )
+
+        result = XRFResult(
+            name=data['application'],
+            date=data['date'],
+            layer=list_of_XRFLayers,
+        )
+        result.normalize(archive, logger)
+        return result
+
+    def write_xrf_data(  # noqa: PLR0912, PLR0915
         self,
-        xrf_dict: dict[str, Any],
+        xrf_data: Union[dict[str, Any], Iterable[dict[str, Any]]],
         archive: 'EntryArchive',
         logger: 'BoundLogger',
-    ) -> None:
+        incremental: bool = True,
+    ) -> int:
         """
-        Write method for populating the `ELNXRayFluorescence` section from a dict.
+        Write method for populating the `ELNXRayFluorescence` section from the
+        measurements of a reader.
+
+        The measurements are consumed one at a time, so a lazy reader like
+        `XRFreader.iter_xrf_measurements` never has to be fully materialized. If the
+        section has no results yet, each `XRFResult` is added as soon as it is built.
+        The elemental compositions of all measurements are normalized at once with
+        `normalize_elemental_compositions` and the composition ratios of all layers
+        are calculated at once with `write_composition_ratios`.
+
+        In incremental mode, every result stores the fingerprint of the measurement it
+        was written from. Measurements with the fingerprint of the existing result of
+        the same name are skipped without building any sections. New measurements are
+        appended and changed ones replace their existing result. Otherwise, all
+        results are built and merged with `merge_sections`.
 
         Args:
-            xrf_dict (dict[str, Any]): A dictionary with the XRF data.
+            xrf_data (Union[dict[str, Any], Iterable[dict[str, Any]]]): A dictionary
+            with the XRF data keyed by application or an iterable of measurements.
             archive (EntryArchive): The archive containing the section.
             logger (BoundLogger): A structlog logger.
+            incremental (bool): Whether to only build the results of new or changed
+            measurements.
+
+        Returns:
+            int: The number of measurements read.
         """
+        if isinstance(xrf_data, dict):
+            xrf_data = xrf_data.values()
+
         # Initialize results and samples lists
         list_of_results = []
         list_of_samples = []
-
-        # write for each measurement in xrf_dict
-        for data in xrf_dict.values():
-            name = data.get('application', None)
-            date = data.get('date', None)
-
-            # create list of XRFLayers each with a list of XRFElementalCompositions
-            list_of_XRFLayers = []
-            for layer, content in data.get('layers', []).items():
-                list_of_ElementalCompositions = []
-                for element, attributes in content.get('elements', {}).items():
-                    xel = XRFElementalComposition(
-                        element=element,
-                        mass_fraction=attributes.get('mass_fraction'),
-                        atomic_fraction=attributes.get('atomic_fraction'),
-                        line=attributes.get('line'),
-                        intensity_peak=attributes.get('intensity_peak'),
-                        intensity_background=attributes.get('intensity_background'),
-                        intensity_background_2=attributes.get('intensity_background_2'),
-                    )
-                    xel.normalize(archive, logger)
-                    list_of_ElementalCompositions.append(xel)
-                if layer == 'CIGS':
-                    GGI, CGI = self.calculate_GGI_CGI(list_of_ElementalCompositions)
-                    list_of_XRFLayers.append(
-                        CIGSLayer(
-                            name=layer,
-                            thickness=content.get('thickness', None),
-                            elements=list_of_ElementalCompositions,
-                            GGI=GGI,
-                            CGI=CGI,
-                        )
-                    )
-                else:
-                    list_of_XRFLayers.append(
-                        XRFLayer(
-                            name=layer,
-                            thickness=content.get('thickness', None),
-                            elements=list_of_ElementalCompositions,
-                        )
-                    )
+        append_results = not self.results
+        existing_results = {}
+        existing_samples = []
+        if incremental:
+            existing_results = {
+                result.name: index for index, result in enumerate(self.results)
+            }
+            existing_samples = [sample.lab_id for sample in self.samples]
+        number_of_results = 0
+        compositions = []
+        list_of_layers = []
+        layer_compositions = []
+        replacements = []
+
+        # write for each measurement in xrf_data
+        for data in xrf_data:
+            number_of_results += 1
+            symbols, atomic_fractions, mass_fractions, layer_indices = (
+                XRFreader.elemental_composition_columns(data)
+            )
+            compositions.append((symbols, atomic_fractions, mass_fractions))
+            existing_index = None
+            fingerprint = None
+            if incremental:
+                fingerprint = XRFreader.fingerprint_measurement(data)
+                existing_index = existing_results.get(data.get('application', None))
+                if (
+                    existing_index is not None
+                    and self.results[existing_index].fingerprint == fingerprint
+                ):
+                    continue
+
+            result = self.build_xrf_result(data, archive, logger)
+            layer_compositions.append(
+                (symbols, atomic_fractions, layer_indices + len(list_of_layers))
+            )
+            list_of_layers.extend(result.layer)
 
             sample = CompositeSystemReference(
                 lab_id=data.get('sample_name', None),
             )
             # append new sample to samples list
-            if sample not in list_of_samples:
+            if sample not in list_of_samples and sample.lab_id not in existing_samples:
                 sample.normalize(archive, logger)
                 list_of_samples.append(sample)
 
             # append new result to results list
-            result = XRFResult(
-                name=name,
-                date=date,
-                layer=list_of_XRFLayers,
+            if existing_index is not None:
+                # replaced once the composition ratios are set, merging would keep
+                # the values of the existing result
+                result.fingerprint = fingerprint
+                replacements.append((existing_index, result))
+            elif append_results or incremental:
+                result.fingerprint = fingerprint
+                self.results.append(result)
+            else:
+                list_of_results.append(result)
+
+        if compositions:
+            normalize_elemental_compositions(
+                *(np.concatenate(columns) for columns in zip(*compositions)),
+                archive,
+                logger,
+            )
+        if list_of_layers:
+            self.write_composition_ratios(
+                list_of_layers,
+                *(np.concatenate(columns) for columns in zip(*layer_compositions)),
             )
-            result.normalize(archive, logger)
-            list_of_results.append(result)
+        if replacements:
+            results = list(self.results)
+            for index, result in replacements:
+                results[index] = result
+            self.results = results
+
+        if incremental:
+            for sample in list_of_samples:
+                self.samples.append(sample)
+            list_of_samples = []
 
         xrf_settings = XRFSettings()
         xrf_settings.normalize(archive, logger)
@@ -389,6 +671,7 @@ class ELNXRayFluorescence(XRayFluorescence, EntryData):
             samples=list_of_samples,
         )
         merge_sections(self, xrf, logger)
+        return number_of_results
 
     def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger'):
         """
@@ -408,10 +691,9 @@ class ELNXRayFluorescence(XRayFluorescence, EntryData):
                     )
             else:
                 with archive.m_context.raw_file(self.data_file) as file:
-                    xrf_dict = read_function(file.name, logger)
-                if xrf_dict:
-                    self.write_xrf_data(xrf_dict, archive, logger)
-                elif logger is not None:
+                    xrf_data = read_function(file.name, logger)
+                    written = self.write_xrf_data(xrf_data, archive, logger)
+                if not written and logger is not None:
                     logger.warn(f'No XRF data found in file: "{self.data_file}".')
         super().normalize(archive, logger)
         if not self.results:
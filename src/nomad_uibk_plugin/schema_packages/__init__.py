@@ -1,6 +1,9 @@
+from typing import Optional
+
 from nomad.config.models.plugins import SchemaPackageEntryPoint
 from nomad.datamodel.data import EntryDataCategory
 from nomad.metainfo.metainfo import Category
+from pydantic import Field
 
 
 class UIBKCategory(EntryDataCategory):
@@ -25,6 +28,15 @@ sample = SampleSchemaPackageEntryPoint(
 
 
 class XRFSchemaPackageEntryPoint(SchemaPackageEntryPoint):
+    parse_cache_size: int = Field(
+        64 * 2**20,
+        description='Maximum size in bytes of the in-memory cache of parsed XRF '
+        'files. Set to 0 to disable the cache.',
+    )
+    parse_cache_entries: int = Field(
+        128, description='Maximum number of files in the cache of parsed XRF files.'
+    )
+
     def load(self):
         from nomad_uibk_plugin.schema_packages.XRFschema import m_package
 
@@ -38,6 +50,51 @@ xrfschema = XRFSchemaPackageEntryPoint(
 
 
 class IFMSchemaPackageEntryPoint(SchemaPackageEntryPoint):
+    model_cache_directory: Optional[str] = Field(
+        None,
+        description='Directory of the on-disk cache of the metadata extracted from '
+        'model files. Defaults to `ifm_model_cache` in the NOMAD tmp directory.',
+    )
+    model_cache_size: int = Field(
+        2**20,
+        description='Maximum size in bytes of the cache of the metadata extracted '
+        'from model files. Set to 0 to disable the cache.',
+    )
+    prediction_cache_directory: Optional[str] = Field(
+        None,
+        description='Directory of the on-disk cache of the predictions read from '
+        'csv files. Defaults to `ifm_prediction_cache` in the NOMAD tmp directory.',
+    )
+    prediction_cache_size: int = Field(
+        256 * 2**20,
+        description='Maximum size in bytes of the cache of the predictions read from '
+        'csv files. Set to 0 to disable the cache.',
+    )
+    heatmap_max_cells: int = Field(
+        2**18,
+        description='Maximum number of cells of the defect heatmaps of IFM analyses, '
+        'the tiles are binned to the most frequent defect type per cell. Set to 0 to '
+        'plot every tile.',
+    )
+    analysis_threads: int = Field(
+        1,
+        description='Number of threads reading the results of the inputs of an IFM '
+        'analysis in parallel.',
+    )
+    asynchronous_analysis: bool = Field(
+        False,
+        description='Run the IFM analysis in the background of the worker, so '
+        'normalizing returns immediately and a later normalize picks up the results.',
+    )
+    analysis_workers: int = Field(
+        1, description='Number of IFM analyses run at the same time in the background.'
+    )
+    analysis_timeout: int = Field(
+        24 * 60 * 60,
+        description='Seconds after which the csv files claimed by a pending IFM '
+        'analysis are analyzed again, e.g. after a worker stopped during the analysis.',
+    )
+
     def load(self):
         from nomad_uibk_plugin.schema_packages.IFMschema import m_package
 
@@ -16,6 +16,7 @@
 # limitations under the License.
 #
 
+import hashlib
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -71,3 +72,14 @@ def find_reference_by_id(
         upload_id = search_result.data[0]['upload_id']
 
         return f'../uploads/{upload_id}/archive/{entry_id}#data'
+
+
+def file_digest(file_path: str, chunk_size: int = 2**20) -> str:
+    """
+    Returns the SHA-256 hex digest of the content of a file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,119 @@
+import random
+import tracemalloc
+
+import pytest
+
+SEPARATOR = '_' * 120 + '\n'
+ELEMENTS = ('Cu', 'Ga', 'In', 'Se', 'Mo', 'Fe', 'Cr')
+LINES = ('Cu-Ka', 'Ga-Ka', 'In-La', 'Se-Ka', 'Mo-La', 'Fe-Ka', 'Cr-Ka')
+INTENSITY_ROWS = '\n'.join(
+    (
+        'Component\t' + '\t'.join(ELEMENTS),
+        'Element line\t' + '\t'.join(LINES),
+        '',
+    )
+)
+BACKGROUND_ROWS = '\n'.join(
+    (
+        'Element line\t' + '\t'.join(line for line in LINES for _ in range(2)),
+        'Peak/BG\t' + '\t'.join(('BG1', 'BG2') * len(LINES)),
+        '',
+    )
+)
+
+
+def xrf_txt_block(index: int, rng: random.Random) -> str:
+    """
+    Returns a synthetic measurement block of a UIBK `.txt` export with a CIGS layer,
+    a Mo layer and a steel substrate.
+    """
+    peaks = '\t'.join(f'{rng.uniform(0, 100):.4f}' for _ in ELEMENTS)
+    backgrounds = '\t'.join(f'{rng.uniform(0, 1):.4f}' for _ in ELEMENTS)
+    measured = '\t'.join(f'{rng.uniform(0, 1):.4f}' for _ in range(2 * len(ELEMENTS)))
+    return (
+        'PositionType\tApplication\tSample name\tDate\t\n'
+        f'{index}-1\tQuant analysis\tCIGS on Mo {index}\tSample_{index}\t'
+        f'2024- 3- {1 + index % 28}  9:{index % 60:02d}\n'
+        '\n'
+        'Component\tCIGS\tCu\tGa\tIn\tSe\tMo-Layer\n'
+        f'Analyzed value\t{rng.uniform(1500, 2500):.1f}\t22.10\t8.20\t18.40\t51.30\t'
+        f'{rng.uniform(400, 600):.1f}\n'
+        'Unit\tnm\tat%\tat%\tat%\tat%\tnm\n'
+        'Component\tMo\tFe\tCr\n'
+        'Analyzed value\t100.00\t80.0\t20.0\n'
+        'Unit\tmass%\tmass%\tmass%\n'
+        f'{INTENSITY_ROWS}'
+        f'Peak intensity\t{peaks}\n'
+        f'BG intensity\t{backgrounds}\n'
+        '\n'
+        f'{BACKGROUND_ROWS}'
+        f'Meas. intensity\t{measured}\n'
+    )
+
+
+def write_xrf_txt(path, number_of_blocks: int, seed: int = 0) -> None:
+    """
+    Writes a synthetic UIBK `.txt` export with the given number of measurement blocks.
+    """
+    rng = random.Random(seed)
+    with open(path, 'w') as file:
+        file.write('XRF quantitative analysis export\n')
+        for index in range(number_of_blocks):
+            file.write(SEPARATOR)
+            file.write(xrf_txt_block(index, rng))
+
+
+def measure_peak_memory(function, *args, **kwargs) -> int:
+    """
+    Returns the peak memory in bytes allocated during a single call of `function`.
+    """
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture(scope='session', name='write_xrf_txt')
+def write_xrf_txt_fixture():
+    """
+    Returns the function writing synthetic UIBK `.txt` exports.
+    """
+    return write_xrf_txt
+
+
+@pytest.fixture
+def peak_memory():
+    """
+    Returns a function measuring the peak memory of a single call of a function.
+    """
+    return measure_peak_memory
+
+
+@pytest.fixture
+def record_throughput(benchmark):
+    """
+    Adds the throughput in blocks/s and the peak memory of a single call of the
+    benchmarked function to the extra info of the benchmark.
+    """
+
+    def record(number_of_blocks: int, function, *args, **kwargs) -> None:
+        benchmark.extra_info['blocks_per_second'] = (
+            number_of_blocks / benchmark.stats.stats.mean
+        )
+        benchmark.extra_info['peak_memory_mib'] = (
+            measure_peak_memory(function, *args, **kwargs) / 2**20
+        )
+
+    return record
+
+
+@pytest.fixture(scope='session', params=[10, 1_000, 50_000])
+def xrf_txt_file(request, tmp_path_factory) -> tuple[str, int]:
+    """
+    Synthetic UIBK `.txt` exports of 10, 1,000 and 50,000 measurement blocks.
+    """
+    path = tmp_path_factory.mktemp('xrf') / f'XRF_{request.param}.txt'
+    write_xrf_txt(path, request.param)
+    return str(path), request.param
@@ -0,0 +1,63 @@
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# modules that take seconds to import and must only be loaded when a model is used
+HEAVY_MODULES = ('tensorflow', 'keras', 'ifm_image_defect_detection')
+
+ENTRY_POINTS = {
+    'sample': 'from nomad_uibk_plugin.schema_packages import sample; sample.load()',
+    'xrfschema': (
+        'from nomad_uibk_plugin.schema_packages import xrfschema; xrfschema.load()'
+    ),
+    'ifmschema': (
+        'from nomad_uibk_plugin.schema_packages import ifmschema; ifmschema.load()'
+    ),
+    'xrfparser': 'from nomad_uibk_plugin.parsers import xrfparser; xrfparser.load()',
+    # imported by `IFMMeasurement.normalize` to read the xml metadata
+    'ifmreader': 'from nomad_uibk_plugin.filereader.IFMreader import read_ifm_xml',
+}
+
+
+def import_times(statement: str) -> dict[str, int]:
+    """
+    Runs `statement` in a fresh interpreter with `-X importtime` and returns the
+    cumulative import time in µs of every imported module.
+    """
+    # load the NOMAD plugins before importing from this plugin
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import nomad.client; {statement}'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line.split('|')
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize('entry_point', ENTRY_POINTS)
+def test_import_time(benchmark, entry_point):
+    times = benchmark.pedantic(
+        import_times, args=(ENTRY_POINTS[entry_point],), rounds=3, iterations=1
+    )
+    benchmark.extra_info['plugin_import_ms'] = (
+        sum(
+            time
+            for module, time in times.items()
+            if module.count('.') == 1 and module.startswith('nomad_uibk_plugin.')
+        )
+        / 1000
+    )
+
+    heavy_modules = [
+        module for module in times if module.split('.')[0] in HEAVY_MODULES
+    ]
+    assert not heavy_modules, f'{entry_point} imports {heavy_modules}'
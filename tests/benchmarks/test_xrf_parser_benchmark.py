@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# load the NOMAD plugins before importing from this plugin
+import nomad.client  # noqa: E402, F401
+from nomad.config import config  # noqa: E402
+from nomad.parsing.parser import MatchingParser  # noqa: E402
+
+from nomad_uibk_plugin.parsers import xrfparser  # noqa: E402
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+LOG_MESSAGES = (
+    'stage moved to position',
+    'tube voltage set',
+    'measurement started',
+    'measurement finished',
+)
+
+
+def text_log(rng: random.Random) -> str:
+    """
+    Returns an unrelated instrument log. One in 20 logs contains the signature of
+    the XRF export.
+    """
+    lines = [
+        f'2024-03-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00 '
+        f'{rng.choice(LOG_LEVELS)}\t{rng.choice(LOG_MESSAGES)} {rng.random():.6f}\n'
+        for _ in range(rng.randint(20, 200))
+    ]
+    if rng.random() < 0.05:  # noqa: PLR2004
+        lines.insert(rng.randrange(len(lines)), 'PositionType changed\n')
+    return ''.join(lines)
+
+
+@pytest.fixture(scope='module')
+def mixed_upload(tmp_path_factory, write_xrf_txt) -> list[tuple[str, bytes, str]]:
+    """
+    The heads of a mixed upload of 10,000 files as read for parser matching: 1,000
+    XRF exports, 8,000 text logs and 1,000 CSV files.
+    """
+    rng = random.Random(0)
+    directory = tmp_path_factory.mktemp('upload')
+    paths = []
+    for index in range(10_000):
+        if index % 10 == 0:
+            path = directory / f'XRF_{index}.txt'
+            write_xrf_txt(path, 2, seed=index)
+        elif index % 10 == 1:  # noqa: PLR2004
+            path = directory / f'table_{index}.csv'
+            path.write_text(text_log(rng).replace('\t', ','))
+        else:
+            path = directory / f'log_{index}.txt'
+            path.write_text(text_log(rng))
+        paths.append(str(path))
+
+    heads = []
+    for path in paths:
+        with open(path, 'rb') as file:
+            buffer = file.read(config.process.parser_matching_size)
+        heads.append((path, buffer, buffer.decode('utf-8')))
+    return heads
+
+
+def match_all(parser, heads: list[tuple[str, bytes, str]]) -> int:
+    return sum(
+        bool(parser.is_mainfile(path, 'text/plain', buffer, decoded_buffer))
+        for path, buffer, decoded_buffer in heads
+    )
+
+
+@pytest.mark.parametrize('staged', [True, False], ids=['staged', 'regex'])
+def test_xrf_parser_matching(benchmark, mixed_upload, staged):
+    """
+    Throughput of matching the XRF parser against a mixed upload with and without
+    the staged prefilter of `XRFParser.is_mainfile`.
+    """
+    parser = xrfparser.load()
+    if not staged:
+        parser = MatchingParser(**xrfparser.dict())
+
+    matched = benchmark.pedantic(
+        match_all, args=(parser, mixed_upload), rounds=5, iterations=1
+    )
+    benchmark.extra_info['files_per_second'] = (
+        len(mixed_upload) / benchmark.stats.stats.mean
+    )
+    assert matched == 1_000  # noqa: PLR2004
@@ -0,0 +1,108 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# load the NOMAD plugins before importing from this plugin
+import nomad.client  # noqa: E402, F401
+
+from nomad_uibk_plugin.schema_packages import XRFreader  # noqa: E402
+
+
+def tokenized_rows(file_path: str) -> list[dict[str, list]]:
+    """
+    Returns the flattened rows of every measurement block of a file.
+    """
+    rows = []
+    with open(file_path) as file:
+        for block in XRFreader.tokenize_xrf_txt(file):
+            if block['meta'] is None:
+                continue
+            block_rows = {
+                key: [token for row in block[key] for token in row]
+                for key in (*XRFreader.XRF_TXT_ROWS, 'int_background_values')
+            }
+            for key in ('values', 'int_peak_values', 'int_background_values'):
+                block_rows[key] = [float(value) for value in block_rows[key]]
+            rows.append(block_rows)
+    return rows
+
+
+def group_all(rows: list[dict[str, list]]) -> list[dict]:
+    return [
+        XRFreader.group_composition_into_layers(
+            {}, block['names'], block['values'], block['units']
+        )
+        for block in rows
+    ]
+
+
+def sort_all(rows: list[dict[str, list]], grouped: list[dict]) -> None:
+    for block, layers in zip(rows, grouped):
+        XRFreader.sort_intensity_values_into_layers(
+            layers,
+            block['int_peak_elements'],
+            block['int_peak_lines'],
+            block['int_peak_values'],
+            block['int_background_lines'],
+            block['int_background_types'],
+            block['int_background_values'],
+        )
+
+
+def test_read_xrf_txt(benchmark, record_throughput, xrf_txt_file):
+    file_path, number_of_blocks = xrf_txt_file
+    xrf_dict = benchmark.pedantic(
+        XRFreader.read_xrf_txt, args=(file_path,), rounds=3, iterations=1
+    )
+    record_throughput(number_of_blocks, XRFreader.read_xrf_txt, file_path)
+
+    assert len(xrf_dict) == number_of_blocks
+
+
+def test_read_xrf_txt_memory_map(benchmark, record_throughput, xrf_txt_file):
+    file_path, number_of_blocks = xrf_txt_file
+    xrf_dict = benchmark.pedantic(
+        XRFreader.read_xrf_txt,
+        args=(file_path,),
+        kwargs=dict(memory_map=True),
+        rounds=3,
+        iterations=1,
+    )
+    record_throughput(
+        number_of_blocks, XRFreader.read_xrf_txt, file_path, memory_map=True
+    )
+
+    assert len(xrf_dict) == number_of_blocks
+
+
+def test_group_composition_into_layers(benchmark, record_throughput, xrf_txt_file):
+    file_path, number_of_blocks = xrf_txt_file
+    rows = tokenized_rows(file_path)
+    grouped = benchmark.pedantic(group_all, args=(rows,), rounds=3, iterations=1)
+    record_throughput(number_of_blocks, group_all, rows)
+
+    assert len(grouped) == number_of_blocks
+
+
+def test_sort_intensity_values_into_layers(benchmark, record_throughput, xrf_txt_file):
+    file_path, number_of_blocks = xrf_txt_file
+    rows = tokenized_rows(file_path)
+    grouped = group_all(rows)
+    benchmark.pedantic(sort_all, args=(rows, grouped), rounds=3, iterations=1)
+    record_throughput(number_of_blocks, sort_all, rows, grouped)
+
+    assert grouped[-1]['CIGS']['elements']['In']['line'] == 'In-La'
+
+
+def test_iter_xrf_measurements_memory(peak_memory, xrf_txt_file):
+    """
+    The streaming reader only keeps one block in memory, apart from the names of
+    the applications already seen.
+    """
+    file_path, number_of_blocks = xrf_txt_file
+
+    def consume(file_path: str) -> None:
+        for _ in XRFreader.iter_xrf_measurements(file_path):
+            pass
+
+    assert peak_memory(consume, file_path) < 2**20 + 256 * number_of_blocks
@@ -0,0 +1,61 @@
+import json
+import zipfile
+
+import h5py
+import numpy as np
+import pytest
+
+# weight shapes of a small sequential model, batch normalization has four variables
+KERAS_WEIGHTS = {
+    'conv2d': [(3, 3, 3, 8), (8,)],
+    'batch_normalization': [(8,), (8,), (8,), (8,)],
+    'dense': [(8, 2), (2,)],
+}
+KERAS_MODEL_CONFIG = {
+    'class_name': 'Sequential',
+    'config': {
+        'name': 'sequential',
+        'layers': [
+            {'class_name': 'InputLayer', 'config': {'batch_shape': [None, 32, 32, 3]}},
+            *(
+                {'class_name': 'Layer', 'config': {'name': name}}
+                for name in KERAS_WEIGHTS
+            ),
+        ],
+    },
+}
+
+
+@pytest.fixture
+def keras_file(tmp_path):
+    """
+    A `.keras` zip archive as written by Keras 3 including optimizer variables.
+    """
+    weights_path = tmp_path / 'model.weights.h5'
+    with h5py.File(weights_path, 'w') as weights:
+        for name, shapes in KERAS_WEIGHTS.items():
+            for index, shape in enumerate(shapes):
+                weights[f'layers/{name}/vars/{index}'] = np.zeros(shape)
+        weights['optimizer/vars/0'] = np.zeros(1000)
+
+    path = tmp_path / 'Model_20241229_binary.keras'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('metadata.json', json.dumps({'keras_version': '3.5.0'}))
+        archive.writestr('config.json', json.dumps(KERAS_MODEL_CONFIG))
+        archive.write(weights_path, 'model.weights.h5')
+    return path
+
+
+@pytest.fixture
+def h5_file(tmp_path):
+    """
+    A legacy `.h5` Keras model file including optimizer weights.
+    """
+    path = tmp_path / 'Model_20241229_classification.h5'
+    with h5py.File(path, 'w') as model_file:
+        model_file.attrs['model_config'] = json.dumps(KERAS_MODEL_CONFIG)
+        for name, shapes in KERAS_WEIGHTS.items():
+            for index, shape in enumerate(shapes):
+                model_file[f'model_weights/{name}/{name}/{index}:0'] = np.zeros(shape)
+        model_file['optimizer_weights/iter:0'] = np.zeros(1000)
+    return path
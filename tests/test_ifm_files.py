@@ -0,0 +1,109 @@
+import os
+
+# load the NOMAD plugins before importing from this plugin
+import nomad.client  # noqa: F401
+import numpy as np
+import pytest
+
+from nomad_uibk_plugin.filereader import IFMfiles
+
+# parameters of the model in `conftest.py`
+NUMBER_OF_PARAMETERS = 216 + 8 + 4 * 8 + 16 + 2
+
+
+def test_read_keras_summary(keras_file, h5_file):
+    for path in (keras_file, h5_file):
+        with open(path, 'rb') as file_obj:
+            assert IFMfiles.read_keras_summary(file_obj) == (3, NUMBER_OF_PARAMETERS)
+
+
+def test_count_keras_layers():
+    # the input layer is part of the layers of a functional model
+    config = {
+        'class_name': 'Functional',
+        'config': {'layers': [{'class_name': 'InputLayer'}, {'class_name': 'Dense'}]},
+    }
+    assert IFMfiles.count_keras_layers(config) == 2  # noqa: PLR2004
+
+
+def test_keras_metadata_cache(tmp_path):
+    cache = IFMfiles.KerasMetadataCache(str(tmp_path / 'cache'))
+    assert cache.get('digest') is None
+    cache.put('digest', (3, NUMBER_OF_PARAMETERS))
+    assert cache.get('digest') == (3, NUMBER_OF_PARAMETERS)
+    assert len(cache) == 1
+
+    # the least recently used entries are evicted
+    (entry,) = (tmp_path / 'cache').iterdir()
+    os.utime(entry, (0, 0))
+    cache.max_size = entry.stat().st_size
+    cache.put('other digest', (4, 100))
+    assert len(cache) == 1
+    assert cache.get('digest') is None
+    assert cache.get('other digest') == (4, 100)
+
+
+def test_read_prediction_csv(tmp_path):
+    csv_path = tmp_path / 'IFM_Sample_prediction.csv'
+    csv_path.write_text(
+        'Image Name,Patch Size,Stride,Defect Type\n'
+        'IFM_Sample.bmp,128,64,None\n'
+        'x,y,Whiskers,Chipping,Scratch,No Error\n'
+        '0,0,0.00000,0.00000,0.00000,1.00000\n'
+        '64,0,0.04692,0.44139,0.51169,0.00000\n'
+        '0,64,0.60000,0.20000,0.20000,0.00000\n'
+    )
+    x, y, labels = IFMfiles.read_prediction_csv(str(csv_path))
+    assert x.tolist() == [0, 64, 0]
+    assert y.tolist() == [0, 0, 64]
+    assert labels.dtype == np.uint8
+    assert [IFMfiles.DEFECT_CLASSES[label] for label in labels] == [
+        'No Error',
+        'Scratch',
+        'Whiskers',
+    ]
+
+    # the predictions are read from the cache until the csv file changes
+    cache = IFMfiles.PredictionCache(str(tmp_path / 'cache'))
+    IFMfiles.read_prediction_csv(str(csv_path), cache)
+    assert len(cache) == 1
+    _, _, cached_labels = IFMfiles.read_prediction_csv(str(csv_path), cache)
+    np.testing.assert_array_equal(cached_labels, labels)
+    with open(csv_path, 'a') as file:
+        file.write('64,64,0.10000,0.80000,0.10000,0.00000\n')
+    _, _, labels = IFMfiles.read_prediction_csv(str(csv_path), cache)
+    assert labels.tolist() == [3, 2, 0, 1]
+    assert len(cache) == 2  # noqa: PLR2004
+
+
+def test_directory_cache_write_failure(tmp_path):
+    cache = IFMfiles.KerasMetadataCache(str(tmp_path / 'cache'))
+
+    # no temporary file is left behind if an entry cannot be written
+    with pytest.raises(TypeError):
+        cache.put('digest', (object(), 100))
+    assert list((tmp_path / 'cache').iterdir()) == []
+
+
+def test_claim_files(tmp_path):
+    csv_paths = [str(tmp_path / f'IFM_{index}_prediction.csv') for index in range(2)]
+    assert IFMfiles.claim_files(csv_paths, timeout=60)
+    assert all(IFMfiles.is_claimed(csv_path, timeout=60) for csv_path in csv_paths)
+
+    # claimed files are not claimed again, not even partially
+    other_path = str(tmp_path / 'IFM_2_prediction.csv')
+    assert not IFMfiles.claim_files([other_path, csv_paths[1]], timeout=60)
+    assert not IFMfiles.is_claimed(other_path, timeout=60)
+
+    # stale claims are taken over and their partial output is removed
+    with open(csv_paths[0], 'w') as file:
+        file.write('x,y,Whiskers\n0,')
+    os.utime(IFMfiles.claim_path(csv_paths[0]), (0, 0))
+    assert not IFMfiles.is_claimed(csv_paths[0], timeout=60)
+    assert IFMfiles.is_interrupted(csv_paths[0], timeout=60)
+    assert IFMfiles.claim_files(csv_paths[:1], timeout=60)
+    assert not os.path.exists(csv_paths[0])
+    assert not IFMfiles.is_interrupted(csv_paths[0], timeout=60)
+
+    IFMfiles.release_files(csv_paths)
+    assert os.listdir(tmp_path) == []
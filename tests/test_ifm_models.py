@@ -0,0 +1,39 @@
+import threading
+import time
+
+# load the NOMAD plugins before importing from this plugin
+import nomad.client  # noqa: F401
+
+from nomad_uibk_plugin.filereader.IFMmodels import BackgroundJobs
+
+
+def test_background_jobs():
+    jobs = BackgroundJobs()
+    started, release = threading.Event(), threading.Event()
+
+    def analysis(image_paths):
+        started.set()
+        release.wait(10)
+        return image_paths
+
+    assert jobs.status('entry') is None
+    jobs.submit('entry', analysis, ['IFM_Sample.bmp'])
+    started.wait(10)
+    assert jobs.status('entry') == 'running'
+    # pending jobs are not submitted again, later jobs wait for a free worker
+    assert jobs.submit('entry', analysis, ['IFM_Sample.bmp']) == 'running'
+    assert jobs.submit('other entry', analysis, ['IFM_Other.bmp']) == 'queued'
+
+    release.set()
+    assert jobs.pop('entry').result(10) == ['IFM_Sample.bmp']
+    jobs.pop('other entry').result(10)
+    assert len(jobs) == 0
+
+    def failing_analysis():
+        raise ValueError('no model')
+
+    jobs.submit('entry', failing_analysis)
+    while jobs.status('entry') in {'queued', 'running'}:
+        time.sleep(0.01)
+    assert jobs.status('entry') == 'failed'
+    assert isinstance(jobs.pop('entry').exception(), ValueError)
@@ -0,0 +1,33 @@
+import locale
+
+# load the NOMAD plugins before importing from this plugin
+import nomad.client  # noqa: F401
+import pytest
+from nomad.utils import get_logger
+
+try:
+    # the reader parses german dates and sets the locale on import
+    locale.setlocale(locale.LC_TIME, 'de_DE.UTF-8')
+except locale.Error:
+    pytest.skip('the de_DE.UTF-8 locale is not available', allow_module_level=True)
+
+from nomad_uibk_plugin.filereader import IFMfiles, IFMreader  # noqa: E402
+
+
+def test_read_keras_metadata_cache(tmp_path, keras_file, monkeypatch):
+    cache = IFMfiles.KerasMetadataCache(str(tmp_path / 'cache'))
+    logger = get_logger(__name__)
+    with open(keras_file, 'rb') as file_obj:
+        model = IFMreader.read_keras_metadata(file_obj, None, logger, cache)
+    assert model.name == 'Binary IFM Model'
+    assert len(cache) == 1
+
+    # cached models are not read again
+    def read_keras_summary(file_obj):
+        raise AssertionError('the model is read again')
+
+    monkeypatch.setattr(IFMreader, 'read_keras_summary', read_keras_summary)
+    with open(keras_file, 'rb') as file_obj:
+        cached_model = IFMreader.read_keras_metadata(file_obj, None, logger, cache)
+    assert cached_model.number_of_layers == model.number_of_layers
+    assert cached_model.number_of_parameters == model.number_of_parameters
@@ -1,8 +1,20 @@
 import os.path
+import shutil
 
+import numpy as np
 from nomad.client import normalize_all, parse
+from nomad.datamodel.metainfo.workflow import Link
+from nomad.metainfo import MProxy
 
-from nomad_uibk_plugin.schema_packages.IFMschema import ureg
+from nomad_uibk_plugin.schema_packages.IFMschema import (
+    IFMAnalysisResult,
+    IFMTwoStepAnalysis,
+    bin_tiles,
+    configuration,
+    prediction_fingerprint,
+    ureg,
+    workflow_links,
+)
 
 
 def test_IFMMeasurement():
@@ -48,3 +60,91 @@ def test_IFMAnalysis():
     assert entry_archive.data.method == 'IFM Two Step Analysis'
     assert entry_archive.metadata.entry_name == 'Analysis'
     assert entry_archive.metadata.entry_type == 'IFMTwoStepAnalysis'
+
+
+def test_bin_tiles():
+    # tiles with a stride of 64 on a 4 x 3 grid, one tile is missing
+    x, y = np.meshgrid(np.arange(0, 256, 64), np.arange(32, 224, 64))
+    x, y = x.ravel()[1:], y.ravel()[1:]
+    labels = np.array([3, 3, 3, 0, 1, 3, 3, 3, 2, 2, 3])
+
+    # the grid of the tiles is kept if it does not exceed the maximum cell count
+    x_cells, y_cells, z = bin_tiles(x, y, labels, 12, 4)
+    assert x_cells.tolist() == [0, 64, 128, 192]
+    assert y_cells.tolist() == [32, 96, 160]
+    assert z[0].tolist() == [-1, 3, 3, 3]
+    assert z[1:].ravel().tolist() == labels[3:].tolist()
+
+    # blocks of 2 x 2 tiles are binned to their most frequent label
+    x_cells, y_cells, z = bin_tiles(x, y, labels, 11, 4)
+    assert x_cells.tolist() == [32, 160]
+    assert y_cells.tolist() == [64, 192]
+    assert z.tolist() == [[0, 3], [2, 2]]
+
+
+def test_prediction_fingerprint(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'IFM_Sample_prediction.csv'
+    csv_path.write_text('x,y,Whiskers,Chipping,Scratch,No Error\n0,0,0,0,0,1\n')
+    fingerprint = prediction_fingerprint(str(csv_path))
+    assert prediction_fingerprint(str(csv_path)) == fingerprint
+
+    # the settings of the heatmap are part of the fingerprint
+    monkeypatch.setattr(configuration, 'heatmap_max_cells', 0)
+    assert prediction_fingerprint(str(csv_path)) != fingerprint
+    monkeypatch.undo()
+
+    with open(csv_path, 'a') as file:
+        file.write('64,0,1,0,0,0\n')
+    assert prediction_fingerprint(str(csv_path)) != fingerprint
+
+
+def test_update_outputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(configuration, 'prediction_cache_size', 0)
+    csv_path = str(tmp_path / 'IFM_Sample_prediction.csv')
+    shutil.copy(
+        os.path.join(os.path.dirname(__file__), 'data', 'IFM_Sample_prediction.csv'),
+        csv_path,
+    )
+    analysis = IFMTwoStepAnalysis()
+    analysis.update_outputs([csv_path])
+    (output,) = analysis.outputs
+    (figure,) = analysis.figures
+
+    # the result of an unchanged csv file is kept
+    analysis.update_outputs([csv_path])
+    assert analysis.outputs[0] is output
+    assert analysis.figures[0] is figure
+
+    # and the result of a changed one is rebuilt
+    with open(csv_path, 'a') as file:
+        file.write('0,64,1.00000,0.00000,0.00000,0.00000\n')
+    analysis.update_outputs([csv_path])
+    assert analysis.outputs[0] is not output
+    assert analysis.outputs[0].fingerprint != output.fingerprint
+    assert analysis.outputs[0].defect_prevalence.whiskers > (
+        output.defect_prevalence.whiskers
+    )
+    assert len(analysis.figures) == 1
+    assert analysis.figures[0] is not figure
+
+
+def test_workflow_links():
+    first, second = IFMAnalysisResult(), IFMAnalysisResult()
+    existing = [
+        Link(name='Extracted Features', section=first),
+        Link(name='Extracted Features', section=first),
+        Link(name='Extracted Features', section=second),
+        Link(name='Binary Model', section=MProxy('../upload/archive/model#/data')),
+    ]
+
+    # existing links are kept, duplicate and outdated links are dropped
+    links = workflow_links(
+        existing,
+        [
+            Link(name='Binary Model', section=MProxy('../upload/archive/model#/data')),
+            Link(name='Extracted Features', section=first),
+            Link(name='Extracted Features', section=first),
+        ],
+    )
+    assert links == [existing[3], existing[0]]
+    assert workflow_links(links, links) == links
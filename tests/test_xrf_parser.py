@@ -0,0 +1,71 @@
+import json
+import os.path
+
+# load the NOMAD plugins before importing from this plugin
+import nomad.client  # noqa: F401
+from nomad.datamodel import ClientContext, EntryArchive, EntryMetadata
+from nomad.utils import get_logger
+
+from nomad_uibk_plugin.parsers import xrfparser
+
+test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_Sample.txt')
+
+
+def is_mainfile(parser, filename: str, buffer: bytes) -> bool:
+    return bool(
+        parser.is_mainfile(filename, 'text/plain', buffer, buffer.decode('utf-8'))
+    )
+
+
+def test_is_mainfile():
+    parser = xrfparser.load()
+    with open(test_file, 'rb') as file:
+        buffer = file.read(4096)
+
+    assert is_mainfile(parser, test_file, buffer)
+    assert not is_mainfile(parser, 'XRF_Sample.csv', buffer)
+    assert not is_mainfile(parser, 'log.txt', b'2024-03-02 09:01 measurement done\n')
+    # the signature alone is not sufficient
+    assert not is_mainfile(parser, 'log.txt', b'PositionType: unknown\n')
+
+
+def test_parse(tmp_path):
+    parser = xrfparser.load()
+    logger = get_logger(__name__)
+    context = ClientContext(local_dir=str(tmp_path))
+
+    def archive():
+        return EntryArchive(
+            m_context=context, metadata=EntryMetadata(upload_id='upload')
+        )
+
+    mainfile = str(tmp_path / 'XRF_0.txt')
+    parsed_archive = archive()
+    parser.parse(mainfile, parsed_archive, logger)
+    assert parsed_archive.metadata.entry_name == 'XRF_0.txt data file'
+    with open(tmp_path / 'XRF_0.archive.json') as file:
+        assert json.load(file)['data']['data_file'] == 'XRF_0.txt'
+
+    # existing archives are not overwritten
+    with open(tmp_path / 'XRF_0.archive.json', 'w') as file:
+        json.dump({'data': {}}, file)
+    assert parser.parse_file(mainfile, archive()) is None
+    with open(tmp_path / 'XRF_0.archive.json') as file:
+        assert json.load(file) == {'data': {}}
+
+
+def test_split_applications():
+    parser = xrfparser.model_copy(update={'split_applications': True}).load()
+    with open(test_file, 'rb') as file:
+        buffer = file.read(4096)
+
+    keys = parser.is_mainfile(test_file, 'text/plain', buffer, buffer.decode('utf-8'))
+    assert keys == ['CIGS on Mo', 'CIGS on Mo thin']
+
+    archive = EntryArchive(metadata=EntryMetadata())
+    child_archives = {key: EntryArchive(metadata=EntryMetadata()) for key in keys}
+    parser.parse(test_file, archive, get_logger(__name__), child_archives)
+    child_data = child_archives['CIGS on Mo thin'].data
+    assert child_data.data_file == 'XRF_Sample.txt'
+    assert child_data.application == 'CIGS on Mo thin'
+    assert archive.metadata.entry_name == 'XRF_Sample.txt data file'
@@ -0,0 +1,238 @@
+import os.path
+from datetime import datetime
+
+# load the NOMAD plugins before importing from this plugin
+import nomad.client  # noqa: F401
+import numpy as np
+
+from nomad_uibk_plugin.schema_packages import XRFreader
+
+test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_Sample.txt')
+
+
+def test_tokenize_xrf_txt():
+    with open(test_file) as file:
+        blocks = list(XRFreader.tokenize_xrf_txt(file))
+
+    assert len(blocks) == 4  # noqa: PLR2004
+    block = blocks[1]
+    assert block['meta'].startswith('PositionType')
+    assert block['names'] == [
+        ['CIGS', 'Cu', 'Ga', 'In', 'Se', 'Mo-Layer'],
+        ['Mo', 'Fe', 'Cr'],
+    ]
+    assert block['units'][1] == ['mass%', 'mass%', 'mass%']
+    assert block['int_peak_lines'][0][0] == 'Cu-Ka'
+    assert block['int_background_types'][0][:2] == ['BG1', 'BG2']
+    assert len(block['int_background_values'][0]) == 14  # noqa: PLR2004
+
+
+def test_read_xrf_txt():
+    xrf_dict = XRFreader.read_xrf_txt(test_file)
+
+    # duplicate application is skipped, first one wins
+    assert list(xrf_dict) == ['CIGS on Mo', 'CIGS on Mo thin']
+    measurement = xrf_dict['CIGS on Mo']
+    assert measurement['sample_name'] == 'Sample_1'
+    assert measurement['date'] == datetime(2024, 3, 2, 9, 1)
+    assert list(measurement['layers']) == ['CIGS', 'Mo-Layer', 'Substrate']
+    assert measurement['layers']['CIGS']['thickness'].magnitude == 1800.5  # noqa: PLR2004
+    assert measurement['layers']['CIGS']['elements']['In'] == dict(
+        atomic_fraction=18.4,
+        line='In-La',
+        intensity_peak=6.3107,
+        intensity_background=0.3174,
+        intensity_background_2=0.0223,
+    )
+    assert measurement['layers']['Substrate']['elements']['Fe']['mass_fraction'] == 80  # noqa: PLR2004
+
+    # layers with zero thickness are removed
+    assert 'Mo-Layer' not in xrf_dict['CIGS on Mo thin']['layers']
+
+
+def test_iter_xrf_measurements():
+    measurements = XRFreader.iter_xrf_measurements(test_file)
+
+    measurement = next(measurements)
+    assert set(measurement) == {'application', 'sample_name', 'date', 'layers'}
+    assert measurement['application'] == 'CIGS on Mo'
+    assert [m['sample_name'] for m in measurements] == ['Sample_2']
+
+
+def test_read_xrf_txt_columnar():
+    xrf_dict = XRFreader.read_xrf_txt(test_file)
+    xrf_columns = XRFreader.read_xrf_txt(test_file, columnar=True)
+
+    assert list(xrf_columns) == list(xrf_dict)
+    measurement = xrf_columns['CIGS on Mo thin']
+    assert measurement['layers']['name'].tolist() == ['CIGS', 'Substrate']
+    assert measurement['elements']['layer'].tolist() == [0, 0, 0, 0, 1, 1]
+    assert measurement['elements']['line'][0] == 'Cu-Ka'
+
+    for application, measurement in xrf_columns.items():
+        layers = XRFreader.columns_to_layers(
+            measurement['layers'], measurement['elements']
+        )
+        assert layers == xrf_dict[application]['layers']
+
+
+def test_group_composition_into_columns_truncated_rows():
+    # the last value of the analyzed values row is missing
+    names = ['CIGS', 'Cu', 'Ga', 'In', 'Se']
+    values = [1800.5, 22.1, 8.3, 18.4]
+    units = ['nm', 'at%', 'at%', 'at%', 'at%']
+
+    layers, elements = XRFreader.group_composition_into_columns(names, values, units)
+    assert XRFreader.columns_to_layers(layers, elements) == (
+        XRFreader.group_composition_into_layers({}, names, values, units)
+    )
+    assert elements['element'].tolist() == ['Cu', 'Ga', 'In']
+
+
+def test_sort_intensity_values_into_layers():
+    def layers():
+        return {
+            'CZTS': {
+                'thickness': 1000,
+                'elements': {
+                    'S': {'atomic_fraction': 20},
+                    'Sn': {'atomic_fraction': 5},
+                },
+            }
+        }
+
+    intensities = (
+        ['Se', 'S', 'Sn', 'Sn'],
+        ['Se-Ka', 'S-Ka', 'Sn-Ka', 'Sn-La'],
+        [1.0, 2.0, 3.0, 4.0],
+        ['S-Ka', 'S-Ka'],
+        ['BG1', 'BG2'],
+        [0.1, 0.2],
+    )
+
+    # 'S' is matched by its own line and not by 'Se-Ka'
+    sorted_layers = XRFreader.sort_intensity_values_into_layers(layers(), *intensities)
+    elements = sorted_layers['CZTS']['elements']
+    assert elements['S']['line'] == 'S-Ka'
+    assert elements['S']['intensity_background_2'] == 0.2  # noqa: PLR2004
+    assert elements['Sn']['line'] == 'Sn-La'
+
+    # ambiguous lines are not assigned in strict mode
+    sorted_layers = XRFreader.sort_intensity_values_into_layers(
+        layers(), *intensities, strict=True
+    )
+    elements = sorted_layers['CZTS']['elements']
+    assert elements['S']['line'] == 'S-Ka'
+    assert 'line' not in elements['Sn']
+
+
+def test_read_xrf_txt_memory_map():
+    assert XRFreader.read_xrf_txt(test_file, memory_map=True) == (
+        XRFreader.read_xrf_txt(test_file)
+    )
+
+
+def test_xrf_parse_cache(tmp_path):
+    cache = XRFreader.XRFParseCache()
+    measurements = list(XRFreader.iter_xrf_measurements(test_file, cache=cache))
+    assert len(cache) == 1
+    assert list(XRFreader.iter_xrf_measurements(test_file, cache=cache)) == (
+        measurements
+    )
+    assert measurements == list(XRFreader.iter_xrf_measurements(test_file))
+
+    # the same content in another file is a cache hit
+    copied_file = tmp_path / 'XRF_Copy.txt'
+    copied_file.write_bytes(open(test_file, 'rb').read())
+    list(XRFreader.iter_xrf_measurements(str(copied_file), cache=cache))
+    assert len(cache) == 1
+
+    # reader options changing the output are part of the key
+    list(XRFreader.iter_xrf_measurements(test_file, cache=cache, columnar=True))
+    assert len(cache) == 2  # noqa: PLR2004
+
+    # the least recently used file is evicted
+    cache = XRFreader.XRFParseCache(max_entries=1)
+    list(XRFreader.iter_xrf_measurements(test_file, cache=cache))
+    list(XRFreader.iter_xrf_measurements(test_file, cache=cache, strict=True))
+    assert len(cache) == 1
+    assert cache.size < 2**12  # noqa: PLR2004
+
+    # files exceeding the size of the cache are not cached
+    cache = XRFreader.XRFParseCache(max_size=100)
+    list(XRFreader.iter_xrf_measurements(test_file, cache=cache))
+    assert len(cache) == 0
+
+
+def test_fingerprint_measurement():
+    measurement, thin_measurement = XRFreader.iter_xrf_measurements(test_file)
+    fingerprint = XRFreader.fingerprint_measurement(measurement)
+
+    assert fingerprint == XRFreader.fingerprint_measurement(
+        next(XRFreader.iter_xrf_measurements(test_file))
+    )
+    assert fingerprint != XRFreader.fingerprint_measurement(thin_measurement)
+
+    measurement['layers']['CIGS']['elements']['Cu']['line'] = 'Cu-Kb'
+    assert fingerprint != XRFreader.fingerprint_measurement(measurement)
+
+
+def test_elemental_composition_columns():
+    measurement = next(XRFreader.iter_xrf_measurements(test_file))
+    columnar_measurement = next(
+        XRFreader.iter_xrf_measurements(test_file, columnar=True)
+    )
+
+    columns = XRFreader.elemental_composition_columns(measurement)
+    symbols, atomic_fractions, mass_fractions, layer_indices = columns
+    assert symbols.tolist() == ['Cu', 'Ga', 'In', 'Se', 'Mo', 'Fe', 'Cr']
+    assert atomic_fractions[0] == 22.1  # noqa: PLR2004
+    assert np.isnan(mass_fractions[:4]).all()
+    assert np.isnan(atomic_fractions[4:]).all()
+    assert layer_indices.tolist() == [0, 0, 0, 0, 1, 2, 2]
+
+    for column, columnar_column in zip(
+        columns, XRFreader.elemental_composition_columns(columnar_measurement)
+    ):
+        np.testing.assert_array_equal(column, columnar_column)
+
+
+def test_composition_ratios():
+    ratios = XRFreader.CompositionRatios()
+    symbols = np.array(
+        ['Cu', 'Ga', 'In', 'Se', 'Mo', 'Cu', 'S', 'Se', 'Se', 'In', 'Ga', 'Cu']
+    )
+    atomic_fractions = np.array([22, 8, 24, 46, np.nan, 20, 10, 40, 46, 24, 8, 22])
+    layers = np.array([0, 0, 0, 0, 1, 2, 2, 2, 3, 3, 3, 3])
+
+    values = ratios(symbols, atomic_fractions, layers, 4)
+    np.testing.assert_allclose(values['GGI'], [0.25, np.nan, np.nan, 0.25])
+    np.testing.assert_allclose(values['CGI'], [0.6875, np.nan, np.nan, 0.6875])
+    np.testing.assert_allclose(values['SSSe'], [0, np.nan, 0.2, 0])
+
+    # identical layers are only calculated once
+    assert len(ratios._cache) == 3  # noqa: PLR2004
+
+
+def test_scan_xrf_applications():
+    assert XRFreader.scan_xrf_applications(test_file) == [
+        'CIGS on Mo',
+        'CIGS on Mo thin',
+    ]
+
+    measurements = XRFreader.iter_xrf_measurements(
+        test_file, applications={'CIGS on Mo thin'}
+    )
+    assert [m['sample_name'] for m in measurements] == ['Sample_2']
+
+    # the cache stores all applications of the file
+    cache = XRFreader.XRFParseCache()
+    for application, sample_name in (
+        ('CIGS on Mo thin', 'Sample_2'),
+        ('CIGS on Mo', 'Sample_1'),
+    ):
+        measurements = XRFreader.iter_xrf_measurements(
+            test_file, cache=cache, applications={application}
+        )
+        assert [m['sample_name'] for m in measurements] == [sample_name]
+    assert len(cache) == 1
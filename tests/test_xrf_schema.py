@@ -0,0 +1,51 @@
+import os.path
+
+# load the NOMAD plugins before importing from this plugin
+import nomad.client  # noqa: F401
+from nomad.datamodel import EntryArchive, EntryMetadata
+from nomad.units import ureg
+from nomad.utils import get_logger
+
+from nomad_uibk_plugin.schema_packages import XRFreader
+from nomad_uibk_plugin.schema_packages.XRFschema import ELNXRayFluorescence
+
+test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_Sample.txt')
+
+
+def read_measurements() -> list[dict]:
+    measurements = list(XRFreader.iter_xrf_measurements(test_file))
+    for measurement in measurements:
+        # the samples are looked up by lab id in the NOMAD search
+        del measurement['sample_name']
+    return measurements
+
+
+def test_write_xrf_data_incremental():
+    xrf = ELNXRayFluorescence()
+    archive = EntryArchive(data=xrf, metadata=EntryMetadata())
+    logger = get_logger(__name__)
+    first, second = read_measurements()
+    xrf.write_xrf_data([first], archive, logger)
+    (result,) = xrf.results
+
+    # unchanged measurements are skipped and new ones are appended
+    assert xrf.write_xrf_data(read_measurements(), archive, logger) == 2  # noqa: PLR2004
+    assert xrf.results[0] is result
+    assert [result.name for result in xrf.results] == [
+        'CIGS on Mo',
+        'CIGS on Mo thin',
+    ]
+
+    # changed measurements replace their result
+    first, second = read_measurements()
+    first['layers']['CIGS']['thickness'] = 999 * ureg('nm')
+    first['layers']['CIGS']['elements']['Cu']['atomic_fraction'] = 33
+    thin_result = xrf.results[1]
+    xrf.write_xrf_data([first, second], archive, logger)
+    assert len(xrf.results) == 2  # noqa: PLR2004
+    assert xrf.results[1] is thin_result
+    layer = xrf.results[0].layer[0]
+    assert layer.thickness.to('nm').magnitude == 999  # noqa: PLR2004
+    assert layer.elements[0].element == 'Cu'
+    assert layer.elements[0].atomic_fraction == 33  # noqa: PLR2004
+    assert xrf.results[0].fingerprint == XRFreader.fingerprint_measurement(first)